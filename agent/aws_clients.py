@@ -0,0 +1,54 @@
+"""Process-wide boto3 clients.
+
+Creating a client loads botocore's service model and credential chain,
+which is tens of milliseconds each time. boto3 clients are thread-safe,
+so every tool call and every session shares one per service, and the
+server's boot warm-up creates them before the first email arrives.
+boto3 itself is imported on first use, not when this module is.
+
+Creating clients is not thread-safe, though: sessions (boto3's default
+one included) share credential and loader state that concurrent
+client() calls can race on, and the warm-up stages call in from several
+threads at once. So clients come from one session of our own, created
+and used under a lock, and each is built exactly once.
+"""
+
+import threading
+from typing import Any
+
+SES_REGION = "us-west-2"
+
+_lock = threading.Lock()
+_session = None
+_clients: dict[tuple[str, str | None], Any] = {}
+
+
+def _client(service: str, region_name: str | None = None):
+    global _session
+    key = (service, region_name)
+    with _lock:
+        if key not in _clients:
+            import boto3
+
+            if _session is None:
+                _session = boto3.session.Session()
+            _clients[key] = _session.client(service, region_name=region_name)
+        return _clients[key]
+
+
+def s3_client():
+    return _client("s3")
+
+
+def ses_client():
+    return _client("sesv2", SES_REGION)
+
+
+def secrets_client():
+    return _client("secretsmanager")
+
+
+def warm_clients() -> None:
+    s3_client()
+    ses_client()
+    secrets_client()
@@ -1,12 +1,22 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+from opentelemetry import trace
 from strands import Agent
 from strands.models import BedrockModel
-
-from agent.tools.email_tools import parse_inbound, send_reply
+from strands.models.model import Model
+
+from agent.site_digest import site_digest
+from agent.tools.changelog_tools import append_changelog_entry, read_changelog
+from agent.tools.email_tools import EmailFeatures, parse_inbound, send_reply
+from agent.tools.gallery_tools import add_gallery_items
+from agent.tools.image_tools import image_info
+from agent.tools.result_budget import ResultBudgetHooks, read_tool_result
 from agent.tools.site_tools import (
-    commit_site_changes,
+    current_workspace,
     delete_site_file,
     list_site_files,
-    push_site_changes,
+    publish_site_changes,
     read_site_file,
     sync_workspace,
     write_site_file,
@@ -15,62 +25,49 @@ from agent.tools.site_tools import (
 REGION = "us-west-2"
 MODEL_ID = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
 
-SYSTEM_PROMPT = """You are Cyndibot, an assistant that helps Cyndi update her \
+CORE_PROMPT = """You are Cyndibot, an assistant that helps Cyndi update her \
 static HTML website at github.com/jessitron/cynditaylor-com by acting on \
 emails she sends you.
 
-You will be given an S3 key pointing at a raw email. Workflow:
+You will be given the key of a raw inbound email. Workflow:
 
   1. Call sync_workspace once. This clones the site repo if needed
      and resets it to origin/main, discarding leftover files from a
-     previous email. This MUST run before parse_inbound, because
-     parse_inbound writes image attachments straight into the
-     workspace's images/ directory.
+     previous email. This MUST run before parse_inbound.
 
-  2. Call parse_inbound with the s3_key to read the email. Its result
-     includes an `attachments` list -- any image/* attachments mom
-     sent have ALREADY been saved into images/ (HEIC converted to
-     JPG).
+  2. Call parse_inbound with the inbound key to read the email.
 
   3. Decide: is this a concrete request to change the website?
-     - If NO (greeting, test, ambiguous), skip to step 9 and reply
-       with a clarifying question. Don't worry about cleaning up
-       attachments; sync_workspace on the next email will clean them.
+     - If NO (greeting, test, ambiguous), skip to step 8 and reply
+       with a clarifying question.
      - If YES, continue.
 
-  4. If parse_inbound returned attachments, decide how each should be
-     used. For ones you want to keep, plan where to reference them in
-     HTML (gallery.html is the usual home; pages can also embed them
-     directly). For ones you don't want -- mom over-attached, or you
-     can't tell which she meant -- call delete_site_file on each.
-     ANY attachment you neither reference in HTML nor delete will end
-     up committed as an orphan, so be deliberate.
-
-  5. Use list_site_files / read_site_file to find or understand the
-     file(s) you need. Prefer reading before writing so you preserve
-     structure and match the site's existing style (CSS links, header,
-     footer, etc).
-
-  6. Call write_site_file with the full new contents of each file you
-     change. When embedding an image, use the `path` from the
-     attachments list (e.g. "images/garden.jpg") and write meaningful
-     alt text -- use mom's description from the email body if she gave
-     one, otherwise a short generic description.
-
-  7. Changelog convention. A file `changelog.html` at the repo root
-     records every change. If it doesn't exist yet, create it with the
-     same CSS link as other pages; no nav link should point to it.
-     Add a new entry to changelog.html for THIS change: include the
-     date (parsed from the email's `date` field, formatted as YYYY-MM-DD)
-     and a short description. Do NOT invent a date -- always use the
-     one from parse_inbound. If the sender's email local part starts
-     with `pretend-` or `smoketest-`, prefix the entry with `[TEST]`
-     so real changes and test changes are distinguishable.
-
-  8. Call commit_site_changes, then push_site_changes. This publishes
-     the change to the live site via GitHub Pages.
-
-  9. Call send_reply:
+  4. Use the site digest (pages and titles, nav, shared stylesheets
+     and header/footer, gallery layout) to pick the file(s) you need,
+     rather than listing and reading to explore. It's in the first
+     message, unless sync_workspace returned a newer site_digest.
+     Read each file before you rewrite it, so you preserve its
+     structure and the site's style (CSS links, header, footer). If
+     mom refers to an earlier change ("the photo I sent in March"),
+     find it with read_changelog for those dates.
+
+  5. Call write_site_file with the full new contents of each file you
+     change.
+
+  6. Call append_changelog_entry for THIS change, passing the `date`
+     field from parse_inbound as-is (never invent one) and a short
+     description. It maintains changelog.html and changelog/ for you;
+     don't read or edit those files, and no nav link should point to
+     them.
+
+  7. Call publish_site_changes with a short commit message. This
+     publishes the change to the live site via GitHub Pages. If it
+     returns problems, fix each one and call it again. If it
+     reports conflict=True, follow its instructions once; if it
+     conflicts again, tell mom in the reply that someone else was
+     editing the same page and you'll need her to resend.
+
+  8. Call send_reply:
        - `to` = the From address from step 2.
        - `subject` = "Re: " + the original subject (unless it starts
          with "Re:" already).
@@ -81,12 +78,104 @@ You will be given an S3 key pointing at a raw email. Workflow:
 
 Keep the reply under 5 sentences. Plain text only."""
 
+ATTACHMENTS_PROMPT = """Attachments. This email has image attachments. \
+parse_inbound's result includes an `attachments` list -- they have \
+ALREADY been saved into images/ (HEIC converted to JPG), which is why \
+sync_workspace has to run first.
+
+Before step 4, decide which attachments to use and where. The gallery \
+is the usual home: add them with ONE add_gallery_items call instead of \
+reading or writing gallery.html. Other pages can embed them directly. \
+Ones you don't use anywhere are dropped automatically when you publish, \
+and listed under `pruned` in the result, so there's no need to delete \
+them.
+
+To tell photos apart, or to spot one that's already on the site, call \
+image_info on their paths (never read_site_file on an image).
+
+Use the `path` from the attachments list (e.g. "images/garden.jpg") and \
+write meaningful alt text -- use mom's description from the email body \
+if she gave one, otherwise a short generic description."""
+
+THREAD_PROMPT = """Thread. This email is a reply in an ongoing thread. \
+parse_inbound returns only what's new in it; the quoted history is \
+stripped. Earlier emails and your replies to them are earlier in this \
+conversation, so resolve references like "it" or "that photo" from \
+there before asking mom to clarify."""
+
+TEST_SENDER_PROMPT = """Test sender. This email comes from a test address \
+(the local part starts with `pretend-` or `smoketest-`). Pass \
+is_test=true to append_changelog_entry so real changes and test changes \
+are distinguishable."""
+
+# Fixed order, so every email with the same features gets byte-identical
+# prompt text and Bedrock's prompt cache keeps hitting.
+PROMPT_SECTIONS = (
+    ("core", CORE_PROMPT),
+    ("attachments", ATTACHMENTS_PROMPT),
+    ("thread", THREAD_PROMPT),
+    ("test_sender", TEST_SENDER_PROMPT),
+)
+
+
+@dataclass(frozen=True)
+class PromptVariant:
+    id: str
+    sections: tuple[str, ...]
+    text: str
+
+
+@lru_cache(maxsize=None)
+def assemble_system_prompt(features: EmailFeatures) -> PromptVariant:
+    wanted = {
+        "core": True,
+        "attachments": features.has_attachments,
+        "thread": features.is_reply,
+        "test_sender": features.is_test_sender,
+    }
+    chosen = [(sid, text) for sid, text in PROMPT_SECTIONS if wanted[sid]]
+    ids = tuple(sid for sid, _ in chosen)
+    return PromptVariant(
+        id="+".join(ids),
+        sections=ids,
+        text="\n\n".join(text for _, text in chosen),
+    )
+
+
+def apply_prompt_variant(agent: Agent, features: EmailFeatures) -> PromptVariant:
+    """Point the agent at the prompt variant for this email, and record
+    which one on the current (invocation) span."""
+    variant = assemble_system_prompt(features)
+    agent.system_prompt = variant.text
+
+    span = trace.get_current_span()
+    span.set_attribute("prompt.variant", variant.id)
+    span.set_attribute("prompt.sections", list(variant.sections))
+    span.set_attribute("prompt.bytes", len(variant.text.encode("utf-8")))
+    return variant
+
+
+@lru_cache(maxsize=None)
+def shared_model() -> BedrockModel:
+    """One Bedrock client for every session's agent; it holds no
+    conversation state, and building it is most of build_agent's cost."""
+    return BedrockModel(model_id=MODEL_ID, region_name=REGION)
+
+
+def initial_message(key: str) -> str:
+    """The user turn that starts an email's run: where the email is, plus
+    the site digest when the workspace has a clone to build it from."""
+    message = f"The inbound email's key is: {key}"
+    digest = site_digest(current_workspace())
+    return message if digest is None else f"{message}\n\n{digest}"
+
 
-def build_agent() -> Agent:
-    model = BedrockModel(model_id=MODEL_ID, region_name=REGION)
+def build_agent(model: Model | None = None) -> Agent:
+    """The Cyndibot agent, on the shared Bedrock model unless `model` is
+    given (the offline benchmarks pass a scripted one)."""
     return Agent(
-        model=model,
-        system_prompt=SYSTEM_PROMPT,
+        model=model or shared_model(),
+        system_prompt=CORE_PROMPT,
         tools=[
             parse_inbound,
             send_reply,
@@ -95,7 +184,12 @@ def build_agent() -> Agent:
             read_site_file,
             write_site_file,
             delete_site_file,
-            commit_site_changes,
-            push_site_changes,
+            image_info,
+            add_gallery_items,
+            append_changelog_entry,
+            read_changelog,
+            publish_site_changes,
+            read_tool_result,
         ],
+        hooks=[ResultBudgetHooks()],
     )
@@ -0,0 +1,106 @@
+"""GitHub token for git over HTTPS, served by the agent process itself.
+
+In AgentCore the token lives in Secrets Manager (GITHUB_TOKEN_SECRET_ARN);
+locally it comes from .env as GITHUB_TOKEN. Either way git gets it from a
+credential helper we pass on each git command line, which reads the token
+from that one subprocess's environment -- nothing is written to disk, and a
+rotated secret is picked up on the next TTL expiry or auth failure instead
+of at the next container restart.
+
+With neither variable set, git_auth() adds nothing and git uses whatever
+credential helper the machine already has (macOS keychain, gh).
+"""
+
+import os
+import threading
+import time
+
+from opentelemetry import trace
+
+from agent.aws_clients import secrets_client
+
+GITHUB_TOKEN_SECRET_ARN = os.environ.get("GITHUB_TOKEN_SECRET_ARN")
+TOKEN_TTL_SECONDS = int(os.environ.get("CYNDIBOT_GITHUB_TOKEN_TTL_SECONDS", "900"))
+
+TOKEN_ENV_VAR = "CYNDIBOT_GIT_TOKEN"
+# x-access-token is the username GitHub expects for token auth; the token
+# is the password.
+_CREDENTIAL_HELPER = (
+    "!f() { test \"$1\" = get || exit 0; "
+    "echo username=x-access-token; "
+    f'echo "password=${TOKEN_ENV_VAR}"; }}; f'
+)
+_AUTH_FAILURE_MARKERS = (
+    "Authentication failed",
+    "Invalid username or password",
+    "could not read Username",
+    "The requested URL returned error: 403",
+    "The requested URL returned error: 401",
+)
+
+
+class TokenProvider:
+    """The secret's current value, re-read after `ttl` seconds or on
+    refresh(). A GITHUB_TOKEN from the environment is used as-is."""
+
+    def __init__(
+        self,
+        secret_arn: str | None = GITHUB_TOKEN_SECRET_ARN,
+        ttl: float = TOKEN_TTL_SECONDS,
+    ):
+        self._secret_arn = secret_arn
+        self._ttl = ttl
+        self._token: str | None = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(os.environ.get("GITHUB_TOKEN") or self._secret_arn)
+
+    def token(self) -> str:
+        env_token = os.environ.get("GITHUB_TOKEN")
+        if env_token:
+            return env_token
+        if not self._secret_arn:
+            raise RuntimeError("neither GITHUB_TOKEN nor GITHUB_TOKEN_SECRET_ARN is set")
+        with self._lock:
+            fresh = time.monotonic() - self._fetched_at < self._ttl
+            span = trace.get_current_span()
+            span.set_attribute("github.token.cache_hit", self._token is not None and fresh)
+            if self._token is None or not fresh:
+                self._token = secrets_client().get_secret_value(
+                    SecretId=self._secret_arn
+                )["SecretString"]
+                self._fetched_at = time.monotonic()
+            return self._token
+
+    def refresh(self) -> bool:
+        """Re-read the secret now. True if that produced a different token,
+        i.e. retrying with it can help; always False for GITHUB_TOKEN,
+        which can't change under a running process."""
+        if os.environ.get("GITHUB_TOKEN") or not self._secret_arn:
+            return False
+        with self._lock:
+            old = self._token
+            self._token = None
+        return self.token() != old
+
+
+github_token = TokenProvider()
+
+
+def git_auth() -> tuple[list[str], dict[str, str]]:
+    """Extra `git` arguments and environment for one git subprocess."""
+    if not github_token.configured:
+        return [], {}
+    # The empty helper clears any configured ones first, so a stale
+    # ~/.git-credentials can't shadow the current token.
+    return (
+        ["-c", "credential.helper=", "-c", f"credential.helper={_CREDENTIAL_HELPER}"],
+        {TOKEN_ENV_VAR: github_token.token()},
+    )
+
+
+def is_auth_failure(stderr: str) -> bool:
+    return any(marker in stderr for marker in _AUTH_FAILURE_MARKERS)
@@ -1,22 +1,206 @@
-import sys
+"""Run the agent on inbound emails from the command line.
+
+    python -m agent.inbound <key>
+    python -m agent.inbound --batch [--prefix P] [--keys-file F] [key ...]
+        [--workers N] [--dry-run]
+
+Keys are S3 keys, or paths under CYNDIBOT_INBOUND_SOURCE when that's a
+local directory. A batch replays many emails at once, e.g. a month of
+mom's emails after a prompt change: each worker has a clone of its own
+beside the main workspace, each email gets a fresh agent, and a table of
+per-email latency, turns, tokens and outcome is printed at the end.
+--dry-run commits locally but never pushes or sends a reply.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent import futures
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from queue import SimpleQueue
 
 from opentelemetry import trace
+from strands.handlers.callback_handler import null_callback_handler
+
+from agent.cyndibot import apply_prompt_variant, build_agent, initial_message
+from agent.inbound_source import inbound_source
+from agent.observability import configure_tracing, ms_since
+from agent.tools.email_tools import inbound_email, inbound_features
+from agent.tools.site_tools import (
+    WORKSPACE_DIR,
+    dry_run,
+    using_workspace,
+    workspace_lease,
+)
+
+REPLAY_DIR = WORKSPACE_DIR.parent / "replay"
+DEFAULT_WORKERS = 4
+
+
+@dataclass
+class ReplayResult:
+    key: str
+    ms: int
+    turns: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    outcome: str = ""
+
+
+def _outcome(tool_metrics) -> str:
+    steps = (("publish_site_changes", "publish"), ("send_reply", "reply"))
+    done = [
+        label
+        for name, label in steps
+        if name in tool_metrics and tool_metrics[name].success_count
+    ]
+    return "+".join(done) or "no reply"
+
+
+def _run_one(key: str, workspace: Path, is_dry_run: bool) -> ReplayResult:
+    tracer = trace.get_tracer("agent.inbound")
+    start = time.monotonic()
+    with (
+        tracer.start_as_current_span("agent.invocation") as span,
+        workspace_lease(workspace),
+        using_workspace(workspace),
+        dry_run() if is_dry_run else nullcontext(),
+    ):
+        span.set_attribute("replay.key", key)
+        agent = build_agent()
+        # Concurrent runs' streamed text would interleave; the table is
+        # the output.
+        agent.callback_handler = null_callback_handler
+        try:
+            with inbound_email(key):
+                apply_prompt_variant(agent, inbound_features(key))
+                result = agent(initial_message(key))
+        except Exception as exc:
+            span.record_exception(exc)
+            return ReplayResult(
+                key,
+                ms_since(start),
+                outcome=f"error: {type(exc).__name__}: {exc}"[:80],
+            )
+    usage = result.metrics.accumulated_usage
+    return ReplayResult(
+        key,
+        ms_since(start),
+        turns=result.metrics.cycle_count,
+        input_tokens=usage["inputTokens"],
+        output_tokens=usage["outputTokens"],
+        outcome=_outcome(result.metrics.tool_metrics),
+    )
 
-from agent.cyndibot import build_agent
-from agent.observability import configure_tracing
+
+def replay(keys: list[str], workers: int, is_dry_run: bool) -> list[ReplayResult]:
+    """Run every key through the agent, `workers` at a time, each worker
+    on a workspace of its own. Results come back in `keys` order."""
+    workers = max(1, min(workers, len(keys)))
+    idle: SimpleQueue[Path] = SimpleQueue()
+    for n in range(1, workers + 1):
+        idle.put(REPLAY_DIR / f"{WORKSPACE_DIR.name}-{n}")
+    lock = threading.Lock()
+    done = 0
+
+    def run(key: str) -> ReplayResult:
+        nonlocal done
+        workspace = idle.get()
+        try:
+            result = _run_one(key, workspace, is_dry_run)
+        finally:
+            idle.put(workspace)
+        with lock:
+            done += 1
+            print(f"[{done}/{len(keys)}] {key}: {result.outcome} ({result.ms} ms)")
+        return result
+
+    REPLAY_DIR.mkdir(parents=True, exist_ok=True)
+    with futures.ThreadPoolExecutor(workers, thread_name_prefix="replay") as pool:
+        return list(pool.map(run, keys))
+
+
+def print_summary(results: list[ReplayResult], wall_ms: int) -> None:
+    width = max(len("key"), *(len(r.key) for r in results))
+    print()
+    print(
+        f"{'key':<{width}}  {'ms':>7}  {'turns':>5}  {'in_tok':>7}  "
+        f"{'out_tok':>7}  outcome"
+    )
+    for r in results:
+        print(
+            f"{r.key:<{width}}  {r.ms:>7}  {r.turns:>5}  {r.input_tokens:>7}  "
+            f"{r.output_tokens:>7}  {r.outcome}"
+        )
+    latencies = sorted(r.ms for r in results)
+    errors = sum(r.outcome.startswith("error") for r in results)
+    print()
+    print(
+        f"{len(results)} emails in {wall_ms} ms, {errors} errors; latency "
+        f"p50 {statistics.median(latencies):.0f} ms, max {latencies[-1]} ms; "
+        f"tokens {sum(r.input_tokens for r in results)} in / "
+        f"{sum(r.output_tokens for r in results)} out"
+    )
+
+
+def _batch_keys(args: argparse.Namespace) -> list[str]:
+    keys = list(args.keys)
+    if args.keys_file:
+        keys += [
+            line.strip()
+            for line in Path(args.keys_file).read_text().splitlines()
+            if line.strip()
+        ]
+    if args.prefix is not None:
+        keys += inbound_source().keys(args.prefix)
+    if not keys:
+        raise SystemExit("no keys: pass keys, --keys-file or --prefix")
+    return keys
 
 
 def main() -> None:
-    if len(sys.argv) < 2:
-        raise SystemExit("usage: python -m agent.inbound <s3_key>")
-    s3_key = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        prog="python -m agent.inbound",
+        description="Run the agent on one inbound email, or replay a batch.",
+    )
+    parser.add_argument("keys", nargs="*", help="inbound email key(s)")
+    parser.add_argument("--batch", action="store_true", help="replay many emails")
+    parser.add_argument("--prefix", help="batch: every key under this prefix")
+    parser.add_argument("--keys-file", help="batch: file with one key per line")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="commit locally; no push, no reply"
+    )
+    args = parser.parse_args()
 
     configure_tracing()
-    agent = build_agent()
-    agent(f"The inbound email is at S3 key: {s3_key}")
-    print()
+    if args.batch:
+        keys = _batch_keys(args)
+        start = time.monotonic()
+        results = replay(keys, args.workers, args.dry_run)
+        print_summary(results, ms_since(start))
+    else:
+        if len(args.keys) != 1:
+            parser.error("pass exactly one key, or --batch")
+        key = args.keys[0]
+        agent = build_agent()
+        tracer = trace.get_tracer("agent.inbound")
+        with (
+            tracer.start_as_current_span("agent.invocation"),
+            workspace_lease(),
+            dry_run() if args.dry_run else nullcontext(),
+            inbound_email(key),
+        ):
+            apply_prompt_variant(agent, inbound_features(key))
+            agent(initial_message(key))
+        print()
 
     trace.get_tracer_provider().shutdown()
+    if args.batch and any(r.outcome.startswith("error") for r in results):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+"""Where inbound emails are read from.
+
+In production SES writes each email's raw MIME to S3 and the agent is
+handed the object key. For dev runs, replays and load tests the same
+files can live in a local directory instead -- a folder of .eml files,
+or a maildir, whose new/ and cur/ messages are keys like
+"new/1700000000.M1P2.host" -- so the whole pipeline runs with no network
+and no AWS credentials.
+
+CYNDIBOT_INBOUND_SOURCE picks one: s3://bucket (the default is the SES
+bucket), or a directory path.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+
+from agent.aws_clients import s3_client
+
+DEFAULT_INBOUND_SOURCE = "s3://cyndibot-incoming-emails"
+
+# Maildir delivery writes here first and renames into new/ when done.
+_MAILDIR_TMP = "tmp"
+
+
+class InboundSource(ABC):
+    """Raw MIME emails addressed by key."""
+
+    @abstractmethod
+    def read(self, key: str) -> bytes: ...
+
+    @abstractmethod
+    def keys(self, prefix: str = "") -> list[str]:
+        """Every key starting with `prefix`, in key order."""
+
+
+class S3InboundSource(InboundSource):
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    def __repr__(self) -> str:
+        return f"s3://{self.bucket}"
+
+    def read(self, key: str) -> bytes:
+        return s3_client().get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def keys(self, prefix: str = "") -> list[str]:
+        pages = s3_client().get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=prefix
+        )
+        return [obj["Key"] for page in pages for obj in page.get("Contents", [])]
+
+
+class LocalInboundSource(InboundSource):
+    def __init__(self, root: Path):
+        if not root.is_dir():
+            raise ValueError(f"inbound directory does not exist: {root}")
+        self.root = root.resolve()
+
+    def __repr__(self) -> str:
+        return str(self.root)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root) or path == self.root:
+            raise ValueError(f"inbound key escapes {self.root}: {key!r}")
+        return path
+
+    def read(self, key: str) -> bytes:
+        path = self._path(key)
+        if not path.is_file():
+            raise FileNotFoundError(f"no inbound email at {path}")
+        return path.read_bytes()
+
+    def keys(self, prefix: str = "") -> list[str]:
+        keys = []
+        for path in self.root.rglob("*"):
+            key = path.relative_to(self.root).as_posix()
+            if path.is_file() and key.startswith(prefix):
+                if path.relative_to(self.root).parts[0] == _MAILDIR_TMP:
+                    continue
+                keys.append(key)
+        return sorted(keys)
+
+
+def source_for(spec: str) -> InboundSource:
+    """The source named by a CYNDIBOT_INBOUND_SOURCE value."""
+    if spec.startswith("s3://"):
+        bucket = spec[5:].rstrip("/")
+        if not bucket or "/" in bucket:
+            raise ValueError(f"inbound source must be s3://bucket: {spec!r}")
+        return S3InboundSource(bucket)
+    return LocalInboundSource(Path(spec))
+
+
+@lru_cache(maxsize=None)
+def inbound_source() -> InboundSource:
+    """The process's inbound source, from CYNDIBOT_INBOUND_SOURCE."""
+    spec = os.environ.get("CYNDIBOT_INBOUND_SOURCE", DEFAULT_INBOUND_SOURCE)
+    return source_for(spec)
@@ -1,19 +1,52 @@
 import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 
 from openinference.instrumentation.bedrock import BedrockInstrumentor
-from opentelemetry import trace
+from opentelemetry import baggage, context, trace
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 
+SESSION_ID_KEY = "session.id"
 
-def configure_tracing(session_id: str | None = None) -> None:
-    resource_attrs = {"openinference.project.name": os.environ["OTEL_SERVICE_NAME"]}
-    if session_id:
-        resource_attrs["session.id"] = session_id
-    resource = Resource.create(resource_attrs)
+
+def ms_since(start: float) -> int:
+    """Whole milliseconds since `start`, a time.monotonic() reading."""
+    return int((time.monotonic() - start) * 1000)
+
+
+class SessionIdSpanProcessor(SpanProcessor):
+    """Copy session.id from baggage onto every span as it starts, so ours,
+    Strands' and Bedrock's spans all carry the session they belong to even
+    when one process serves several sessions at once."""
+
+    def on_start(self, span, parent_context=None) -> None:
+        session_id = baggage.get_baggage(SESSION_ID_KEY, parent_context)
+        if session_id:
+            span.set_attribute(SESSION_ID_KEY, str(session_id))
+
+
+@contextmanager
+def session_context(session_id: str | None) -> Iterator[None]:
+    if not session_id:
+        yield
+        return
+    token = context.attach(baggage.set_baggage(SESSION_ID_KEY, session_id))
+    try:
+        yield
+    finally:
+        context.detach(token)
+
+
+def configure_tracing() -> None:
+    resource = Resource.create(
+        {"openinference.project.name": os.environ["OTEL_SERVICE_NAME"]}
+    )
     provider = TracerProvider(resource=resource)
+    provider.add_span_processor(SessionIdSpanProcessor())
     provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
 
     trace.set_tracer_provider(provider)
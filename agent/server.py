@@ -1,32 +1,308 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent import futures
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
 from bedrock_agentcore import BedrockAgentCoreApp
 from bedrock_agentcore.runtime.context import RequestContext
 from opentelemetry import trace
 
-from agent.cyndibot import build_agent
-from agent.observability import configure_tracing
+from agent.aws_clients import warm_clients
+from agent.observability import configure_tracing, ms_since, session_context
+
+# The agent modules pull in strands, its tool registry and the site/email
+# tools. They're imported on first use (boot warm-up, usually), so /ping
+# answers as soon as the HTTP server is up.
+if TYPE_CHECKING:
+    from strands import Agent
+
+AGENT_POOL_SIZE = int(os.environ.get("CYNDIBOT_AGENT_POOL_SIZE", "16"))
+AGENT_POOL_MAX_BYTES = int(
+    os.environ.get("CYNDIBOT_AGENT_POOL_MAX_BYTES", str(64 * 1024 * 1024))
+)
+# Sessions AgentCore didn't name (local curl against /invocations) share one.
+DEFAULT_SESSION_ID = "local"
+
+
+def _flush_publisher() -> None:
+    # Only an invocation imports site_tools, so with nothing imported
+    # nothing can be queued.
+    site_tools = sys.modules.get("agent.tools.site_tools")
+    if site_tools is not None and site_tools.publisher is not None:
+        site_tools.publisher.flush()
+
+
+@asynccontextmanager
+async def _lifespan(app) -> AsyncIterator[None]:
+    """Push queued site commits on shutdown. AgentCore stops a microVM
+    with SIGTERM; uvicorn turns that into a graceful shutdown that runs
+    this, then re-raises the signal, so atexit handlers never run."""
+    yield
+    await asyncio.to_thread(_flush_publisher)
+
+
+app = BedrockAgentCoreApp(lifespan=_lifespan)
+
+
+@dataclass
+class _PooledAgent:
+    agent: "Agent"
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    in_use: int = 0
+    conversation_bytes: int = 0
+
+
+class AgentPool:
+    """One Agent (and so one conversation) per session, least recently
+    used evicted first.
+
+    The pool lock only guards the dict. Each session has its own lock,
+    so a session's invocations run one at a time (a Strands Agent refuses
+    concurrent calls) while different sessions run in parallel. Size is
+    capped by agent count and by the JSON size of all held conversations.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[], "Agent"],
+        max_agents: int = AGENT_POOL_SIZE,
+        max_bytes: int = AGENT_POOL_MAX_BYTES,
+    ):
+        self._build = build
+        self._max_agents = max_agents
+        self._max_bytes = max_bytes
+        self._agents: OrderedDict[str, _PooledAgent] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self, session_id: str) -> Iterator["Agent"]:
+        span = trace.get_current_span()
+        with self._lock:
+            entry = self._agents.get(session_id)
+            if entry is not None:
+                self._agents.move_to_end(session_id)
+                entry.in_use += 1
+        span.set_attribute("agent.pool.hit", entry is not None)
+
+        if entry is None:
+            built = _PooledAgent(agent=self._build())
+            with self._lock:
+                # Another invocation for this session may have won the race.
+                entry = self._agents.setdefault(session_id, built)
+                self._agents.move_to_end(session_id)
+                entry.in_use += 1
+
+        try:
+            with entry.lock:
+                yield entry.agent
+                entry.conversation_bytes = len(
+                    json.dumps(entry.agent.messages, default=str)
+                )
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                self._evict()
+                span.set_attribute("agent.pool.size", len(self._agents))
+                span.set_attribute("agent.pool.bytes", self._total_bytes())
+
+    def _total_bytes(self) -> int:
+        return sum(e.conversation_bytes for e in self._agents.values())
+
+    def _evict(self) -> None:
+        for session_id in list(self._agents):
+            if (
+                len(self._agents) <= self._max_agents
+                and self._total_bytes() <= self._max_bytes
+            ):
+                return
+            if self._agents[session_id].in_use == 0:
+                del self._agents[session_id]
+
+
+class WorkspaceQueue:
+    """First-come, first-served turns per workspace.
+
+    Runs against the same workspace go one at a time in arrival order
+    (a plain Lock makes no ordering promise, so a busy session could
+    starve another); runs against different workspaces don't wait on
+    each other at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiting: dict[str, deque[threading.Event]] = {}
 
-app = BedrockAgentCoreApp()
+    @contextmanager
+    def turn(self, workspace: str) -> Iterator[None]:
+        mine = threading.Event()
+        with self._lock:
+            queue = self._waiting.setdefault(workspace, deque())
+            queue.append(mine)
+            ahead = len(queue) - 1
+            if ahead == 0:
+                mine.set()
 
-_agent = None
+        span = trace.get_current_span()
+        span.set_attribute("workspace.path", workspace)
+        span.set_attribute("workspace.queue.depth", ahead)
+        start = time.monotonic()
+        mine.wait()
+        span.set_attribute("workspace.queue.wait_ms", ms_since(start))
+        try:
+            yield
+        finally:
+            with self._lock:
+                queue.popleft()
+                if queue:
+                    queue[0].set()
+                else:
+                    del self._waiting[workspace]
 
 
-def _get_agent(session_id: str | None):
-    global _agent
-    if _agent is None:
-        configure_tracing(session_id=session_id)
-        _agent = build_agent()
-    return _agent
+class Warmup:
+    """Boot-time work that the first invocation would otherwise pay for.
+
+    Stages run in parallel background threads under one agent.startup
+    span, which gets a startup.<stage>_ms attribute per stage and ends
+    when the last one finishes. A failed stage is recorded on the span
+    and otherwise ignored: the invocation path does the same work lazily
+    and will raise there if it's really broken.
+    """
+
+    def __init__(self, stages: dict[str, Callable[[], object]]):
+        self._stages = stages
+        self._futures: list[futures.Future] = []
+
+    def start(self) -> None:
+        span = trace.get_tracer("agent.server").start_span("agent.startup")
+        executor = futures.ThreadPoolExecutor(
+            max_workers=len(self._stages), thread_name_prefix="warmup"
+        )
+
+        def run(name: str, stage: Callable[[], object]) -> None:
+            start = time.monotonic()
+            with trace.use_span(span, end_on_exit=False):
+                try:
+                    stage()
+                except Exception as exc:
+                    span.record_exception(exc)
+                    span.set_attribute(f"startup.{name}.failed", True)
+                finally:
+                    span.set_attribute(f"startup.{name}_ms", ms_since(start))
+
+        self._futures = [
+            executor.submit(run, name, stage) for name, stage in self._stages.items()
+        ]
+        executor.shutdown(wait=False)
+
+        def finish() -> None:
+            futures.wait(self._futures)
+            span.end()
+
+        threading.Thread(target=finish, name="warmup-finish", daemon=True).start()
+
+    def wait(self) -> None:
+        pending = [f for f in self._futures if not f.done()]
+        span = trace.get_current_span()
+        span.set_attribute("startup.pending_stages", len(pending))
+        if pending:
+            start = time.monotonic()
+            futures.wait(pending)
+            span.set_attribute("startup.wait_ms", ms_since(start))
+
+
+def _build_agent() -> "Agent":
+    from agent.cyndibot import build_agent
+
+    return build_agent()
+
+
+def _warm_model() -> None:
+    from agent.cyndibot import shared_model
+
+    shared_model()
+
+
+def _warm_workspace() -> None:
+    from agent.tools.site_tools import (
+        WORKSPACE_DIR,
+        sync_workspace_impl,
+        using_workspace,
+        workspace_lease,
+        worktree_pool,
+    )
+
+    if worktree_pool is not None:
+        with worktree_pool.lease():
+            sync_workspace_impl()
+        return
+    with workspace_lease(WORKSPACE_DIR), using_workspace(WORKSPACE_DIR):
+        sync_workspace_impl()
+
+
+_pool = AgentPool(_build_agent)
+_workspace_queue = WorkspaceQueue()
+_warmup = Warmup(
+    {
+        "workspace": _warm_workspace,
+        "aws_clients": warm_clients,
+        "model": _warm_model,
+    }
+)
+
+
+@contextmanager
+def _leased_workspace() -> Iterator[None]:
+    """A worktree from the pool when there is one; otherwise a FIFO turn
+    on the single clone."""
+    from agent.tools.site_tools import (
+        WORKSPACE_DIR,
+        using_workspace,
+        workspace_lease,
+        worktree_pool,
+    )
+
+    if worktree_pool is not None:
+        with worktree_pool.lease():
+            yield
+        return
+    with (
+        _workspace_queue.turn(str(WORKSPACE_DIR)),
+        workspace_lease(WORKSPACE_DIR),
+        using_workspace(WORKSPACE_DIR),
+    ):
+        yield
 
 
 @app.entrypoint
 def invoke(payload, context: RequestContext):
+    from agent.cyndibot import apply_prompt_variant, initial_message
+    from agent.tools.email_tools import inbound_email, inbound_features
+
     s3_key = payload["s3_key"]
-    agent = _get_agent(context.session_id)
+    session_id = context.session_id or DEFAULT_SESSION_ID
     tracer = trace.get_tracer("agent.server")
-    with tracer.start_as_current_span("agent.invocation"):
-        result = agent(f"The inbound email is at S3 key: {s3_key}")
+    with session_context(session_id), tracer.start_as_current_span("agent.invocation"):
+        _warmup.wait()
+        with (
+            _pool.lease(session_id) as agent,
+            _leased_workspace(),
+            inbound_email(s3_key),
+        ):
+            apply_prompt_variant(agent, inbound_features(s3_key))
+            result = agent(initial_message(s3_key))
     return {"result": str(result.message)}
 
 
 if __name__ == "__main__":
+    configure_tracing()
+    _warmup.start()
     app.run()
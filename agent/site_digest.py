@@ -0,0 +1,265 @@
+"""A compact map of the site, so the model doesn't rediscover it each email.
+
+Pages with titles, the nav, which stylesheets and header/footer the pages
+share, the gallery's layout and where images live. It only changes when
+the site does, so it's keyed by the commit it describes and built from
+git objects rather than the working tree. Per-file facts are persisted
+under /mnt/workspace/.cyndibot/digests/; a new commit re-parses only the
+files that changed since the newest digest on disk.
+
+The first message gets the digest of what sync_workspace is about to
+reset to. If origin moved on in between, sync_workspace returns a fresh
+digest of the HEAD it actually reset to (refreshed_digest), so the model
+never plans against a stale one.
+"""
+
+import hashlib
+import json
+import subprocess
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any
+
+from opentelemetry import trace
+
+from agent.observability import ms_since
+from agent.tools.blobs import read_blobs
+from agent.tools.site_tools import STATE_DIR, run_git, sync_target
+
+DIGEST_DIR = STATE_DIR / "digests"
+# Bump when PageFacts or _PageParser change, so old digests are rebuilt.
+DIGEST_VERSION = 1
+MAX_PAGES_LISTED = 40
+
+_HTML_SUFFIXES = (".html", ".htm")
+
+# The commit the model's current digest describes, for this invocation.
+_described_sha: ContextVar[str | None] = ContextVar(
+    "cyndibot_digest_sha", default=None
+)
+
+
+@dataclass
+class PageFacts:
+    title: str = ""
+    stylesheets: list[str] = field(default_factory=list)
+    nav: list[tuple[str, str]] = field(default_factory=list)
+    header_hash: str = ""
+    footer_hash: str = ""
+    figures: int = 0
+    figure_pattern: str = ""
+
+
+class _PageParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.facts = PageFacts()
+        self._stack: list[str] = []
+        self._in_title = False
+        self._nav_href: str | None = None
+        self._nav_text: list[str] = []
+        self._sections: dict[str, list[str]] = {"header": [], "footer": []}
+
+    def _inside(self, tag: str) -> bool:
+        return tag in self._stack
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "title":
+            self._in_title = True
+        elif tag == "link" and "stylesheet" in (attrs.get("rel") or "").lower():
+            self.facts.stylesheets.append(attrs.get("href") or "")
+        elif tag == "a" and self._inside("nav"):
+            self._nav_href = attrs.get("href") or ""
+            self._nav_text = []
+        elif tag == "figure":
+            self.facts.figures += 1
+            if not self.facts.figure_pattern:
+                cls = attrs.get("class")
+                self.facts.figure_pattern = (
+                    f'<figure class="{cls}">' if cls else "<figure>"
+                )
+        for section, parts in self._sections.items():
+            if self._inside(section) or tag == section:
+                parts.append(f"<{tag}>")
+        if tag not in {"link", "meta", "img", "br", "hr", "input", "source"}:
+            self._stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "a" and self._nav_href is not None:
+            text = " ".join("".join(self._nav_text).split())
+            self.facts.nav.append((text, self._nav_href))
+            self._nav_href = None
+        if tag in self._stack:
+            while self._stack and self._stack.pop() != tag:
+                pass
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.facts.title += data.strip()
+        if self._nav_href is not None:
+            self._nav_text.append(data)
+        for section, parts in self._sections.items():
+            if self._inside(section):
+                parts.append(" ".join(data.split()))
+
+    def result(self) -> PageFacts:
+        for section, parts in self._sections.items():
+            if parts:
+                digest = hashlib.sha1("".join(parts).encode("utf-8")).hexdigest()[:8]
+                setattr(self.facts, f"{section}_hash", digest)
+        return self.facts
+
+
+def _page_facts(html: str) -> PageFacts:
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+    return parser.result()
+
+
+def _digest_path(sha: str) -> Path:
+    return DIGEST_DIR / f"{sha}.json"
+
+
+def _latest_on_disk() -> dict[str, Any] | None:
+    latest = DIGEST_DIR / "latest.json"
+    if not latest.exists():
+        return None
+    state = json.loads(latest.read_text())
+    return state if state.get("version") == DIGEST_VERSION else None
+
+
+def _build_state(repo: Path, sha: str) -> tuple[dict[str, Any], str, int]:
+    """Per-file facts at `sha`, reusing the newest persisted digest.
+    Returns the state, how it was built, and how many pages were parsed."""
+    if _digest_path(sha).exists():
+        state = json.loads(_digest_path(sha).read_text())
+        if state.get("version") == DIGEST_VERSION:
+            return state, "disk", 0
+
+    files = run_git("ls-tree", "-r", "--name-only", sha, cwd=repo).splitlines()
+    pages = [f for f in files if f.lower().endswith(_HTML_SUFFIXES)]
+    base = _latest_on_disk()
+    method = "full"
+    to_parse = pages
+    facts: dict[str, Any] = {}
+    if base is not None:
+        try:
+            changed = run_git(
+                "diff", "--name-only", base["sha"], sha, cwd=repo
+            ).splitlines()
+        except subprocess.CalledProcessError:
+            changed = None  # base commit no longer in this repo
+        if changed is not None:
+            method = "incremental"
+            page_set = set(pages)
+            facts = {p: f for p, f in base["pages"].items() if p in page_set}
+            to_parse = [p for p in pages if p in set(changed) or p not in facts]
+
+    blobs = read_blobs(repo, [f"{sha}:{path}" for path in to_parse])
+    for path in to_parse:
+        facts[path] = asdict(_page_facts(blobs[f"{sha}:{path}"]))
+
+    state = {
+        "version": DIGEST_VERSION,
+        "sha": sha,
+        "pages": facts,
+        "images": dict(
+            Counter(str(Path(f).parent) for f in files if f.startswith("images/"))
+        ),
+    }
+    DIGEST_DIR.mkdir(parents=True, exist_ok=True)
+    for target in (_digest_path(sha), DIGEST_DIR / "latest.json"):
+        # Whole-file replace: concurrent invocations may be reading it.
+        partial = target.with_suffix(f".{threading.get_ident()}.partial")
+        partial.write_text(json.dumps(state))
+        partial.replace(target)
+    return state, method, len(to_parse)
+
+
+def _render(state: dict[str, Any]) -> str:
+    pages: dict[str, dict[str, Any]] = state["pages"]
+    n = len(pages)
+    lines = [f"Site digest (commit {state['sha'][:7]}, {n} pages):"]
+
+    listed = sorted(pages)[:MAX_PAGES_LISTED]
+    entries = []
+    for path in listed:
+        facts = pages[path]
+        entry = f'{path} "{facts["title"]}"' if facts["title"] else path
+        if facts["figures"]:
+            entry += f' [{facts["figures"]} x {facts["figure_pattern"]}]'
+        entries.append(entry)
+    more = f"; +{n - len(listed)} more" if n > len(listed) else ""
+    lines.append("- Pages: " + "; ".join(entries) + more)
+
+    navs = Counter(
+        tuple(tuple(link) for link in f["nav"]) for f in pages.values() if f["nav"]
+    )
+    if navs:
+        nav, count = navs.most_common(1)[0]
+        links = " | ".join(f"{text} -> {href}" for text, href in nav)
+        lines.append(f"- Nav (on {count}/{n} pages): {links}")
+
+    sheets = Counter(s for f in pages.values() for s in f["stylesheets"])
+    if sheets:
+        shared = ", ".join(f"{s} ({c}/{n})" for s, c in sheets.most_common(4))
+        lines.append(f"- Stylesheets: {shared}")
+
+    for section in ("header", "footer"):
+        hashes = Counter(
+            f[f"{section}_hash"] for f in pages.values() if f[f"{section}_hash"]
+        )
+        if hashes:
+            common, count = hashes.most_common(1)[0]
+            example = min(p for p, f in pages.items() if f[f"{section}_hash"] == common)
+            lines.append(
+                f"- <{section}>: the same on {count}/{n} pages; copy it from "
+                f"{example}"
+            )
+
+    if state["images"]:
+        dirs = ", ".join(f"{d}/ ({c})" for d, c in sorted(state["images"].items()))
+        lines.append(f"- Images: {dirs}")
+    return "\n".join(lines)
+
+
+def _digest_of(repo: Path, sha: str) -> str:
+    start = time.monotonic()
+    state, method, parsed = _build_state(repo, sha)
+    text = _render(state)
+    span = trace.get_current_span()
+    span.set_attribute("site_digest.sha", sha)
+    span.set_attribute("site_digest.method", method)
+    span.set_attribute("site_digest.pages_parsed", parsed)
+    span.set_attribute("site_digest.bytes", len(text.encode("utf-8")))
+    span.set_attribute("site_digest.build_ms", ms_since(start))
+    _described_sha.set(sha)
+    return text
+
+
+def site_digest(repo: Path) -> str | None:
+    """The digest of what `repo`'s workspace will be reset to, or None when
+    there's no clone yet. Stamps site_digest.* on the current span."""
+    if not (repo / ".git").exists():
+        trace.get_current_span().set_attribute("site_digest.method", "unavailable")
+        return None
+    return _digest_of(repo, run_git("rev-parse", sync_target(repo), cwd=repo).strip())
+
+
+def refreshed_digest(repo: Path) -> str | None:
+    """After a sync: the digest of `repo`'s HEAD if it isn't the commit the
+    model's digest describes (origin moved on, or there was no clone to
+    describe yet); None while that digest is still current."""
+    head = run_git("rev-parse", "HEAD", cwd=repo).strip()
+    stale = _described_sha.get() != head
+    trace.get_current_span().set_attribute("site_digest.refreshed", stale)
+    return _digest_of(repo, head) if stale else None
@@ -0,0 +1,76 @@
+"""Reading git blobs, and caching what's derived from them.
+
+Page checks, site builds, digests and image metadata all work from blob
+contents and cache their results by blob sha, since a blob never
+changes. read_blobs reads many blobs in one `git cat-file --batch`;
+BlobCache keeps derived JSON in memory and as one file per key on disk.
+"""
+
+import json
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any
+
+
+def read_blobs(repo: Path, names: list[str]) -> dict[str, str]:
+    """Contents of the objects `names` (shas, or <commit>:<path>) in
+    `repo`, decoded as UTF-8, in one git process. Raises for a name that
+    isn't there."""
+    if not names:
+        return {}
+    out = subprocess.run(
+        ["git", "cat-file", "--batch"],
+        cwd=str(repo),
+        input="".join(f"{name}\n" for name in names).encode("utf-8"),
+        capture_output=True,
+        check=True,
+    ).stdout
+    blobs = {}
+    pos = 0
+    for name in names:
+        header_end = out.index(b"\n", pos)
+        header = out[pos:header_end].split()
+        if header[-1] == b"missing":
+            raise KeyError(f"no such object in {repo}: {name!r}")
+        size = int(header[2])
+        blobs[name] = out[header_end + 1 : header_end + 1 + size].decode(
+            "utf-8", errors="replace"
+        )
+        pos = header_end + 1 + size + 1
+    return blobs
+
+
+class BlobCache:
+    """JSON entries keyed by blob sha (plus whatever else they depend
+    on), in memory and as <directory>/<key>.json. Entries stamped with
+    another `version` are ignored, so bumping it rebuilds them."""
+
+    def __init__(self, version: int):
+        self.version = version
+        self._memory: dict[tuple[Path, str], dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, directory: Path, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            if (directory, key) in self._memory:
+                return self._memory[directory, key]
+        path = directory / f"{key}.json"
+        if path.exists():
+            entry = json.loads(path.read_text())
+            if entry.get("version") == self.version:
+                with self._lock:
+                    self._memory[directory, key] = entry
+                return entry
+        return None
+
+    def put(self, directory: Path, key: str, entry: dict[str, Any]) -> dict[str, Any]:
+        """Store `entry` stamped with the version, and return it so."""
+        entry = {**entry, "version": self.version}
+        with self._lock:
+            self._memory[directory, key] = entry
+        directory.mkdir(parents=True, exist_ok=True)
+        partial = directory / f"{key}.{threading.get_ident()}.partial"
+        partial.write_text(json.dumps(entry))
+        partial.replace(directory / f"{key}.json")
+        return entry
@@ -0,0 +1,353 @@
+"""Append to the site's changelog without reading or rewriting it.
+
+The changelog only ever grows, so having the model read and rewrite it
+made every email cost more than the last. Entries live in one page per
+year, changelog/YYYY.html, newest first right after a fixed anchor
+comment; changelog.html is a small generated index of the years. The
+model supplies just the date and a one-line description, and reads back
+only the years it asks about.
+
+A changelog.html from before the split (one page of entries) is moved
+into the year pages on the first append; until then read_changelog reads
+it in place.
+"""
+
+import html
+import re
+from datetime import date
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any
+
+from opentelemetry import trace
+from strands import tool
+
+from agent.tools.result_budget import shape_result
+from agent.tools.site_refs import resolve_ref
+from agent.tools.site_tools import current_workspace
+
+CHANGELOG_PATH = "changelog.html"
+CHANGELOG_DIR = "changelog"
+ENTRIES_ANCHOR = "<!-- cyndibot:changelog-entries (newest first) -->"
+INDEX_MARKER = "<!-- cyndibot:changelog-index (generated) -->"
+TEST_PREFIX = "[TEST] "
+
+_STYLESHEET_LINK_RE = re.compile(
+    r"<link\b[^>]*\brel=[\"']?stylesheet[\"']?[^>]*>", re.IGNORECASE
+)
+_HREF_RE = re.compile(r"""(\bhref=)(["']?)([^"'\s>]+)\2""", re.IGNORECASE)
+_LIST_RE = re.compile(r"<(ul|ol)\b[^>]*>(.*?)</\1\s*>", re.IGNORECASE | re.DOTALL)
+_LI_RE = re.compile(r"<li\b[^>]*>(.*?)</li\s*>", re.IGNORECASE | re.DOTALL)
+_TIME_RE = re.compile(r"""<time\b[^>]*\bdatetime=["']?(\d{4}-\d{2}-\d{2})""")
+_ISO_DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_TAG_RE = re.compile(r"<[^>]+>")
+_TIME_ELEMENT_RE = re.compile(r"<time\b.*?</time\s*>", re.IGNORECASE | re.DOTALL)
+_OPEN_TAG_BEFORE_RE = re.compile(r"<([a-z][a-z0-9]*)\b[^>]*>\s*$", re.IGNORECASE)
+_CLOSE_TAG_AFTER_RE = re.compile(r"\s*</([a-z][a-z0-9]*)\s*>", re.IGNORECASE)
+_LINK_RE = re.compile(r"<a\b.*?</a\s*>", re.IGNORECASE | re.DOTALL)
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+# Page chrome a migration may drop: the generated index has its own.
+_CHROME_RE = re.compile(
+    r"<(head|script|style|nav|header|footer|h[1-6])\b.*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>{title}</title>
+{stylesheets}</head>
+<body>
+  <h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+_SHARD_BODY = f"""  <p><a href="../{CHANGELOG_PATH}">All years</a></p>
+  <ul class="changelog">
+    {ENTRIES_ANCHOR}
+  </ul>"""
+
+
+def _entry_date(value: str) -> date:
+    """YYYY-MM-DD, or the email's own Date header as parse_inbound gives it."""
+    value = value.strip()
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).date()
+    except (TypeError, ValueError) as exc:
+        raise ValueError(
+            f"date must be YYYY-MM-DD or an email Date header: {value!r}"
+        ) from exc
+
+
+def _stylesheet_links(prefix: str) -> str:
+    """index.html's <link rel=stylesheet> tags, one per line, with local
+    hrefs rewritten for a page `prefix` deeper than the site root."""
+    index = current_workspace() / "index.html"
+    if not index.exists():
+        return ""
+
+    def rebase(m: re.Match) -> str:
+        target = resolve_ref(m.group(3), "index.html")
+        href = m.group(3) if target is None else prefix + target
+        return f"{m.group(1)}{m.group(2)}{href}{m.group(2)}"
+
+    links = _STYLESHEET_LINK_RE.findall(index.read_text(encoding="utf-8"))
+    return "".join(f"  {_HREF_RE.sub(rebase, link)}\n" for link in links)
+
+
+def _format_entry(day: date, description: str, is_test: bool) -> str:
+    description = " ".join(description.split())
+    if not description:
+        raise ValueError("description must not be empty")
+    if is_test and not description.startswith(TEST_PREFIX.strip()):
+        description = TEST_PREFIX + description
+    iso = day.isoformat()
+    return f'<li><time datetime="{iso}">{iso}</time> {html.escape(description)}</li>'
+
+
+def _shard_rel_path(year: int) -> str:
+    return f"{CHANGELOG_DIR}/{year}.html"
+
+
+def _shard_years(workspace: Path) -> list[int]:
+    shard_dir = workspace / CHANGELOG_DIR
+    if not shard_dir.is_dir():
+        return []
+    return sorted(
+        (int(p.stem) for p in shard_dir.glob("*.html") if p.stem.isdigit()),
+        reverse=True,
+    )
+
+
+def _write_index(workspace: Path) -> None:
+    years = "\n".join(
+        f'    <li><a href="{_shard_rel_path(y)}">{y}</a></li>'
+        for y in _shard_years(workspace)
+    )
+    body = f'  {INDEX_MARKER}\n  <ul class="changelog-years">\n{years}\n  </ul>'
+    page = _PAGE_TEMPLATE.format(
+        title="Changelog", stylesheets=_stylesheet_links(""), body=body
+    )
+    (workspace / CHANGELOG_PATH).write_text(page, encoding="utf-8")
+
+
+def _insert_entries(workspace: Path, year: int, entries: list[str]) -> bool:
+    """Put `entries` (newest first) at the top of `year`'s page. Returns
+    whether the page had to be created."""
+    shard = workspace / _shard_rel_path(year)
+    created = not shard.exists()
+    if created:
+        shard.parent.mkdir(parents=True, exist_ok=True)
+        page = _PAGE_TEMPLATE.format(
+            title=f"Changelog {year}",
+            stylesheets=_stylesheet_links("../"),
+            body=_SHARD_BODY,
+        )
+    else:
+        page = shard.read_text(encoding="utf-8")
+    if ENTRIES_ANCHOR not in page:
+        raise ValueError(f"{_shard_rel_path(year)} is missing {ENTRIES_ANCHOR}")
+    block = "".join(f"\n    {entry}" for entry in entries)
+    shard.write_text(page.replace(ENTRIES_ANCHOR, ENTRIES_ANCHOR + block, 1), "utf-8")
+    return created
+
+
+def _legacy_entry(inner: str) -> tuple[date, str] | None:
+    """Date and normalized <li> for one entry of a pre-split changelog;
+    None for an item with no YYYY-MM-DD date, which isn't an entry."""
+    ours = _TIME_RE.search(inner)
+    if ours:
+        return date.fromisoformat(ours.group(1)), f"<li>{inner.strip()}</li>"
+    found = _ISO_DATE_RE.search(_TAG_RE.sub("", inner))
+    if found is None:
+        return None
+    iso = found.group(1)
+    text = _without_date(inner, iso).strip().lstrip(":-–— ").strip()
+    entry = f'<li><time datetime="{iso}">{iso}</time> {text}</li>'
+    return date.fromisoformat(iso), entry
+
+
+def _without_date(inner: str, iso: str) -> str:
+    """`inner` without its first text occurrence of `iso`, and without
+    any element that held nothing but the date (<b>2026-01-05</b>)."""
+    for m in re.finditer(re.escape(iso), inner):
+        if inner.rfind("<", 0, m.start()) <= inner.rfind(">", 0, m.start()):
+            start, end = m.span()
+            break
+    else:
+        raise ValueError(f"{iso} is only inside a tag in changelog item {inner!r}")
+    while True:
+        opening = _OPEN_TAG_BEFORE_RE.search(inner[:start])
+        closing = _CLOSE_TAG_AFTER_RE.match(inner, end)
+        if not (
+            opening and closing and opening[1].lower() == closing[1].lower()
+        ):
+            return inner[:start] + inner[end:]
+        start, end = opening.start(), closing.end()
+
+
+def _legacy_entries(page: str) -> list[tuple[date, str]]:
+    """The dated entries of a pre-split changelog page. Only lists with at
+    least one dated item count, so the page's nav and footer lists are
+    left alone. Undated items are skipped here; _check_migratable refuses
+    to split a page that has any."""
+    entries = []
+    for _, body in _LIST_RE.findall(page):
+        found = [_legacy_entry(inner) for inner in _LI_RE.findall(body)]
+        entries += [entry for entry in found if entry is not None]
+    return entries
+
+
+def _check_migratable(page: str) -> None:
+    """Raise unless splitting `page` loses nothing but page chrome: every
+    item of an entries list must have a date, and besides those lists
+    only head, headings, nav/header/footer, scripts, styles and lists of
+    bare links may be on the page."""
+    rest = _CHROME_RE.sub("", _COMMENT_RE.sub("", page))
+    for m in reversed(list(_LIST_RE.finditer(rest))):
+        items = _LI_RE.findall(m.group(2))
+        undated = [inner for inner in items if _legacy_entry(inner) is None]
+        if len(undated) < len(items):
+            if undated:
+                raise ValueError(
+                    f"can't split {CHANGELOG_PATH} by year: item "
+                    f"{_TAG_RE.sub('', undated[0]).strip()[:80]!r} has no "
+                    "YYYY-MM-DD date; date it or remove it by hand"
+                )
+        elif any(_TAG_RE.sub("", _LINK_RE.sub("", i)).strip() for i in items):
+            # Not entries and not just links: the leftover check reports it.
+            continue
+        rest = rest[: m.start()] + rest[m.end() :]
+    leftover = " ".join(html.unescape(_TAG_RE.sub(" ", rest)).split())
+    if leftover:
+        raise ValueError(
+            f"can't split {CHANGELOG_PATH} by year without losing "
+            f"{leftover[:80]!r}; move that text elsewhere by hand first"
+        )
+
+
+def _migrate_single_page(workspace: Path) -> int:
+    """Move a pre-split changelog.html's entries into year pages. Returns
+    how many entries moved; 0 when there's nothing to migrate. Raises
+    instead of dropping anything the year pages can't hold."""
+    index = workspace / CHANGELOG_PATH
+    if not index.exists():
+        return 0
+    page = index.read_text(encoding="utf-8")
+    if INDEX_MARKER in page:
+        return 0
+
+    legacy = _legacy_entries(page)
+    if not legacy and _ISO_DATE_RE.search(_TAG_RE.sub("", page)):
+        raise ValueError(
+            f"can't split {CHANGELOG_PATH} by year: it has dates but no <li> "
+            "entries; move them into changelog/YYYY.html by hand"
+        )
+    _check_migratable(page)
+    by_year: dict[int, list[tuple[date, str]]] = {}
+    for day, entry in legacy:
+        by_year.setdefault(day.year, []).append((day, entry))
+    for year, entries in by_year.items():
+        entries.sort(key=lambda e: e[0], reverse=True)
+        _insert_entries(workspace, year, [entry for _, entry in entries])
+    _write_index(workspace)
+    return sum(len(entries) for entries in by_year.values())
+
+
+def append_changelog_entry_impl(
+    entry_date: str, description: str, is_test: bool = False
+) -> dict[str, Any]:
+    workspace = current_workspace()
+    day = _entry_date(entry_date)
+    entry = _format_entry(day, description, is_test)
+
+    migrated = _migrate_single_page(workspace)
+    created = _insert_entries(workspace, day.year, [entry])
+    if created or not (workspace / CHANGELOG_PATH).exists():
+        _write_index(workspace)
+
+    span = trace.get_current_span()
+    span.set_attribute("changelog.shard", _shard_rel_path(day.year))
+    span.set_attribute("changelog.created", created)
+    span.set_attribute("changelog.migrated_entries", migrated)
+    return {
+        "path": _shard_rel_path(day.year),
+        "created": created,
+        "migrated_entries": migrated,
+        "entry": entry,
+    }
+
+
+def read_changelog_impl(since: str, until: str | None = None) -> list[dict[str, str]]:
+    """Entries dated since..until (inclusive), newest first, reading only
+    the year pages that range covers. Never writes: a changelog that
+    hasn't been split yet is read as the single page it is."""
+    start = _entry_date(since)
+    end = _entry_date(until) if until else date.max
+    workspace = current_workspace()
+
+    index = workspace / CHANGELOG_PATH
+    pages = [
+        _shard_rel_path(y)
+        for y in _shard_years(workspace)
+        if start.year <= y <= end.year
+    ]
+    if index.exists() and INDEX_MARKER not in index.read_text(encoding="utf-8"):
+        pages.append(CHANGELOG_PATH)
+    entries = []
+    for rel_path in pages:
+        page = (workspace / rel_path).read_text(encoding="utf-8")
+        for day, entry in _legacy_entries(page):
+            if start <= day <= end:
+                text = _TAG_RE.sub("", _TIME_ELEMENT_RE.sub("", entry))
+                text = html.unescape(text).strip()
+                entries.append((day, {"date": day.isoformat(), "text": text}))
+    entries.sort(key=lambda e: e[0], reverse=True)
+
+    trace.get_current_span().set_attribute("changelog.shards_read", pages)
+    return [e for _, e in entries]
+
+
+@tool
+def append_changelog_entry(
+    date: str, description: str, is_test: bool = False
+) -> dict[str, Any]:
+    """Add an entry for this change to the site's changelog, newest first.
+
+    Maintains the per-year pages under changelog/ and the changelog.html
+    index, creating them (with the site's stylesheet) when needed. No
+    need to read or rewrite any changelog file yourself.
+
+    Args:
+        date: The email's date: the `date` field from parse_inbound as-is,
+            or YYYY-MM-DD. Never today's date or a guess.
+        description: One short sentence describing the change.
+        is_test: True when the email came from a test sender; the entry
+            is then prefixed with [TEST].
+
+    Returns:
+        Dict with path (the year page), created (whether that page was
+        new) and the entry HTML that was added.
+    """
+    return append_changelog_entry_impl(date, description, is_test)
+
+
+@tool
+def read_changelog(since: str, until: str | None = None) -> list[dict[str, str]]:
+    """Look up past changes to the site by date, e.g. to answer "what did
+    you change last spring?" or to find an earlier edit to build on.
+
+    Args:
+        since: First date to include, YYYY-MM-DD.
+        until: Last date to include, YYYY-MM-DD. Omit for "up to now".
+
+    Returns:
+        List of {date, text} entries, newest first.
+    """
+    return shape_result("read_changelog", read_changelog_impl(since, until))
@@ -1,23 +1,26 @@
 import email
 import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from email import policy
 from email.message import EmailMessage
+from email.utils import parseaddr
+from html.parser import HTMLParser
 from io import BytesIO
 from pathlib import Path
 from typing import Any
 
-import boto3
-import pillow_heif
 from opentelemetry import trace
-from PIL import Image
 from strands import tool
 
-from agent.tools.site_tools import WORKSPACE_DIR
+from agent.aws_clients import ses_client
+from agent.inbound_source import inbound_source
+from agent.tools.images import pil_image
+from agent.tools.result_budget import shape_result
+from agent.tools.site_tools import current_workspace, is_dry_run
 
-pillow_heif.register_heif_opener()
-
-INBOUND_BUCKET = "cyndibot-incoming-emails"
-SES_REGION = "us-west-2"
 REPLY_FROM = "Cyndibot <bot@cyndibot.jessitron.honeydemo.io>"
 
 # https://aws.amazon.com/ses/pricing/ — marginal rate after free tier.
@@ -25,15 +28,170 @@ REPLY_FROM = "Cyndibot <bot@cyndibot.jessitron.honeydemo.io>"
 # see lambda/invoke_agent.
 SES_SEND_PRICE_USD = 0.0001
 
+# Local parts of sender addresses whose changes are tests, not real edits.
+TEST_SENDER_PREFIXES = ("pretend-", "smoketest-")
+
 _tracer = trace.get_tracer(__name__)
 _FILENAME_SAFE_RE = re.compile(r"[^A-Za-z0-9._-]")
 
-
-def _best_body(msg: EmailMessage, content_type: str) -> str:
-    part = msg.get_body(preferencelist=(content_type,))
-    if part is None:
-        return ""
-    return part.get_content()
+# "On Mon, May 4, 2026 at 10:02 AM Cyndibot <bot@...> wrote:" -- Gmail and
+# Apple Mail wrap long attributions, so this is matched against a line
+# joined with the one after it too.
+_ATTRIBUTION_RE = re.compile(r"^On\b.{0,300}\bwrote:\s*$", re.DOTALL)
+_HISTORY_MARKER_RE = re.compile(
+    r"^(-{2,}\s*Original Message\s*-{2,}|_{20,}|From: .+ <?\S+@\S+>?)\s*$",
+    re.IGNORECASE,
+)
+_MOBILE_SIGNATURE_RE = re.compile(
+    r"^(Sent from my \w+|Sent from (Yahoo )?Mail\b.*|Sent from Outlook\b.*"
+    r"|Get Outlook for \w+)",
+    re.IGNORECASE,
+)
+_HTML_BLOCK_TAGS = frozenset(
+    {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote"}
+)
+
+
+@dataclass(frozen=True)
+class EmailFeatures:
+    has_attachments: bool
+    is_reply: bool
+    is_test_sender: bool
+
+
+@dataclass
+class BodyDigest:
+    text: str
+    source: str
+    original_bytes: int
+    quoted_bytes: int
+    signature_bytes: int
+
+
+class _HTMLToText(HTMLParser):
+    """Plain-text rendering of an HTML body. Blockquote lines come out
+    prefixed with "> " so the quote stripper treats them like a plain
+    text reply's quoted history."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._lines: list[str] = [""]
+        self._skip = 0
+        self._quote_depth = 0
+
+    def _newline(self) -> None:
+        if self._lines[-1].strip():
+            self._lines.append("")
+
+    def handle_starttag(self, tag, attrs):
+        if tag in {"script", "style", "head"}:
+            self._skip += 1
+        elif tag in _HTML_BLOCK_TAGS:
+            self._newline()
+            if tag == "blockquote":
+                self._quote_depth += 1
+            elif tag == "li":
+                self._lines[-1] += "- "
+
+    def handle_endtag(self, tag):
+        if tag in {"script", "style", "head"}:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in _HTML_BLOCK_TAGS:
+            if tag == "blockquote":
+                self._quote_depth = max(self._quote_depth - 1, 0)
+            self._newline()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        text = re.sub(r"\s+", " ", data)
+        if not self._lines[-1]:
+            text = text.lstrip()
+            if text and self._quote_depth:
+                self._lines[-1] = "> " * self._quote_depth
+        self._lines[-1] += text
+
+    def text(self) -> str:
+        return "\n".join(line.rstrip() for line in self._lines).strip()
+
+
+def _html_to_text(html: str) -> str:
+    parser = _HTMLToText()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+def _strip_quoted_history(text: str, is_reply: bool) -> tuple[str, int]:
+    """Drop quoted history from a reply. Returns (new_content, quoted_bytes).
+
+    Everything from an attribution line ("On ... wrote:") or an
+    Outlook-style history header onward is dropped, and so are ">" lines
+    interleaved above it. All of this only when the headers say this is a
+    reply: a first email that mentions "wrote:" or uses ">" to set off a
+    list (prices, a poem) keeps it.
+    """
+    if not is_reply:
+        return text.strip(), 0
+    lines = text.splitlines()
+    cut = len(lines)
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        joined = f"{stripped} {lines[i + 1].strip()}" if i + 1 < len(lines) else stripped
+        if (
+            _ATTRIBUTION_RE.match(stripped)
+            or _ATTRIBUTION_RE.match(joined)
+            or _HISTORY_MARKER_RE.match(stripped)
+        ):
+            cut = i
+            break
+    kept = [line for line in lines[:cut] if not line.lstrip().startswith(">")]
+    new_content = "\n".join(kept).strip()
+    quoted_bytes = len(text.strip().encode("utf-8")) - len(new_content.encode("utf-8"))
+    return new_content, max(quoted_bytes, 0)
+
+
+def _strip_signature(text: str) -> tuple[str, int]:
+    """Drop a "-- " delimited signature and trailing mobile sign-offs."""
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if line.rstrip() in {"--", "-- "}:
+            lines = lines[:i]
+            break
+    while lines and (not lines[-1].strip() or _MOBILE_SIGNATURE_RE.match(lines[-1].strip())):
+        lines.pop()
+    stripped = "\n".join(lines).strip()
+    return stripped, len(text.encode("utf-8")) - len(stripped.encode("utf-8"))
+
+
+def _digest_body(msg: EmailMessage) -> BodyDigest:
+    """New content of the email only: no quoted thread, no signature.
+
+    The plain part is preferred; the HTML part is rendered to text only
+    when there's no plain part at all.
+    """
+    plain = msg.get_body(preferencelist=("plain",))
+    html = msg.get_body(preferencelist=("html",))
+    original_bytes = sum(
+        len(p.get_content().encode("utf-8")) for p in (plain, html) if p is not None
+    )
+    if plain is not None:
+        source, text = "plain", plain.get_content()
+    elif html is not None:
+        source, text = "html", _html_to_text(html.get_content())
+    else:
+        source, text = "none", ""
+
+    is_reply = bool(msg.get("In-Reply-To") or msg.get("References"))
+    new_content, quoted_bytes = _strip_quoted_history(text, is_reply)
+    digest_text, signature_bytes = _strip_signature(new_content)
+    return BodyDigest(
+        text=digest_text,
+        source=source,
+        original_bytes=original_bytes,
+        quoted_bytes=quoted_bytes,
+        signature_bytes=max(signature_bytes, 0),
+    )
 
 
 def _sanitize_filename(name: str) -> str:
@@ -74,13 +232,13 @@ def _convert_heic_to_jpg(payload: bytes, target: Path, original_filename: str) -
     with _tracer.start_as_current_span("convert_heic_to_jpg") as span:
         span.set_attribute("image.original_filename", original_filename)
         span.set_attribute("image.input_bytes", len(payload))
-        Image.open(BytesIO(payload)).convert("RGB").save(
+        pil_image().open(BytesIO(payload)).convert("RGB").save(
             target, format="JPEG", quality=90
         )
         output_bytes = target.stat().st_size
         span.set_attribute("image.output_bytes", output_bytes)
         span.set_attribute(
-            "image.target_path", str(target.relative_to(WORKSPACE_DIR))
+            "image.target_path", str(target.relative_to(current_workspace()))
         )
         return output_bytes
 
@@ -103,19 +261,62 @@ def _write_image_attachment(part, images_dir: Path) -> dict[str, Any]:
         final_size = len(payload)
 
     return {
-        "path": str(target.relative_to(WORKSPACE_DIR)),
+        "path": str(target.relative_to(current_workspace())),
         "original_filename": raw_filename,
         "size_bytes": final_size,
         "content_type": final_content_type,
     }
 
 
-def parse_inbound_impl(s3_key: str) -> dict[str, Any]:
-    s3 = boto3.client("s3")
-    raw = s3.get_object(Bucket=INBOUND_BUCKET, Key=s3_key)["Body"].read()
-    msg: EmailMessage = email.message_from_bytes(raw, policy=policy.default)  # type: ignore[assignment]
+# The email the current invocation is handling, read once by
+# inbound_email() so inbound_features() and parse_inbound share the read.
+_inbound_raw: ContextVar[tuple[str, bytes] | None] = ContextVar(
+    "inbound_raw", default=None
+)
+
+
+@contextmanager
+def inbound_email(key: str) -> Iterator[None]:
+    """Hold the raw MIME at `key` for one invocation. Tool threads copy
+    the context, so they see it too; it's dropped when the block exits."""
+    token = _inbound_raw.set((key, inbound_source().read(key)))
+    try:
+        yield
+    finally:
+        _inbound_raw.reset(token)
+
+
+def _fetch_raw(key: str) -> bytes:
+    held = _inbound_raw.get()
+    if held is not None and held[0] == key:
+        return held[1]
+    return inbound_source().read(key)
+
+
+def _parse_raw(key: str) -> EmailMessage:
+    return email.message_from_bytes(_fetch_raw(key), policy=policy.default)  # type: ignore[return-value]
+
+
+def inbound_features(key: str) -> EmailFeatures:
+    """What the system prompt needs to know about an email before the
+    agent sees it. Reads headers and MIME structure only; nothing is
+    decoded or written to the workspace."""
+    msg = _parse_raw(key)
+    _, sender = parseaddr(str(msg.get("From", "")))
+    return EmailFeatures(
+        has_attachments=any(
+            part.get_content_type().startswith("image/")
+            for part in msg.iter_attachments()
+        ),
+        is_reply=bool(msg.get("In-Reply-To") or msg.get("References")),
+        is_test_sender=sender.lower().startswith(TEST_SENDER_PREFIXES),
+    )
+
 
-    images_dir = WORKSPACE_DIR / "images"
+def parse_inbound_impl(key: str) -> dict[str, Any]:
+    msg = _parse_raw(key)
+
+    images_dir = current_workspace() / "images"
     attachments: list[dict[str, Any]] = []
     bytes_total = 0
     for part in msg.iter_attachments():
@@ -126,7 +327,15 @@ def parse_inbound_impl(s3_key: str) -> dict[str, Any]:
         attachments.append(meta)
         bytes_total += meta["size_bytes"]
 
+    digest = _digest_body(msg)
+
     span = trace.get_current_span()
+    span.set_attribute("email.inbound.source", repr(inbound_source()))
+    span.set_attribute("email.body.source", digest.source)
+    span.set_attribute("email.body.original_bytes", digest.original_bytes)
+    span.set_attribute("email.body.digest_bytes", len(digest.text.encode("utf-8")))
+    span.set_attribute("email.body.quoted_bytes", digest.quoted_bytes)
+    span.set_attribute("email.body.signature_bytes", digest.signature_bytes)
     span.set_attribute("email.attachment.count", len(attachments))
     if attachments:
         span.set_attribute("email.attachment.bytes_total", bytes_total)
@@ -140,8 +349,8 @@ def parse_inbound_impl(s3_key: str) -> dict[str, Any]:
         "to": str(msg.get("To", "")),
         "subject": str(msg.get("Subject", "")),
         "date": str(msg.get("Date", "")),
-        "body_text": _best_body(msg, "plain"),
-        "body_html": _best_body(msg, "html"),
+        "body_text": digest.text,
+        "quoted_history_omitted": digest.quoted_bytes > 0,
         "message_id": str(msg.get("Message-ID", "")),
         "in_reply_to": str(msg.get("In-Reply-To", "")),
         "references": str(msg.get("References", "")),
@@ -166,12 +375,14 @@ def send_reply_impl(
         reply["References"] = refs
     reply.set_content(body_text)
 
-    ses = boto3.client("sesv2", region_name=SES_REGION)
-    resp = ses.send_email(
+    span = trace.get_current_span()
+    if is_dry_run():
+        span.set_attribute("email.reply.dry_run", True)
+        return {"ses_message_id": None, "dry_run": True}
+    resp = ses_client().send_email(
         Content={"Raw": {"Data": reply.as_bytes()}},
     )
 
-    span = trace.get_current_span()
     span.set_attribute("cost.ses.send.qty", 1)
     span.set_attribute("cost.ses.send.price", SES_SEND_PRICE_USD)
 
@@ -182,20 +393,24 @@ def send_reply_impl(
 
 
 @tool
-def parse_inbound(s3_key: str) -> dict[str, Any]:
-    """Read a raw MIME email from S3 and return its structured fields.
+def parse_inbound(key: str) -> dict[str, Any]:
+    """Read the inbound raw MIME email and return its structured fields.
 
     Args:
-        s3_key: Object key inside the cyndibot-incoming-emails bucket
-            (e.g. "emails/abc123..."). Usually the value of
-            receipt.action.objectKey from the SES notification.
+        key: The inbound email's key, exactly as given in the first
+            message (e.g. "emails/abc123...").
 
     Returns:
-        Dict with from, to, subject, date, body_text, body_html,
-        message_id, in_reply_to, references, attachments. Missing
-        headers return as empty strings. `date` is the RFC 2822 Date
-        header from the email (not the current time) -- use it for
-        changelog entries so requests and records line up.
+        Dict with from, to, subject, date, body_text,
+        quoted_history_omitted, message_id, in_reply_to, references,
+        attachments. Missing headers return as empty strings. `date` is
+        the RFC 2822 Date header from the email (not the current time) --
+        use it for changelog entries so requests and records line up.
+
+        `body_text` is only what's new in this email: quoted history
+        from earlier messages in the thread and the sender's signature
+        are stripped (quoted_history_omitted says whether any was). HTML
+        is rendered to text only when the email has no plain-text part.
 
         `attachments` is a list of image attachments that have ALREADY
         been written into the workspace. Each entry has:
@@ -206,8 +421,11 @@ def parse_inbound(s3_key: str) -> dict[str, Any]:
             so an inbound image/heic shows up here as image/jpeg)
         Empty list when there are no images. The workspace must exist
         before calling this -- run sync_workspace first.
+
+        Very long bodies are cut short with a note giving a handle for
+        read_tool_result.
     """
-    return parse_inbound_impl(s3_key)
+    return shape_result("parse_inbound", parse_inbound_impl(key))
 
 
 @tool
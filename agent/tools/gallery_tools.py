@@ -0,0 +1,202 @@
+"""Add photos to gallery.html without reading or rewriting the page.
+
+gallery.html is the fastest-growing page on the site. New items are
+built from the page's own last <figure> -- same classes, same wrapper
+markup -- pointed at a generated thumbnail with loading="lazy" and
+linked to the full-size image, and inserted after it. Whatever in the
+template names its own photo besides src (srcset, sizes, data-src,
+<picture> sources) is dropped from the copy.
+"""
+
+import html
+import re
+import time
+from pathlib import Path
+from typing import Any
+
+from opentelemetry import trace
+from strands import tool
+
+from agent.observability import ms_since
+from agent.tools.images import pil_image, pil_image_ops
+from agent.tools.site_tools import current_workspace, validate_path
+
+GALLERY_PATH = "gallery.html"
+THUMBS_DIR = "images/thumbs"
+THUMB_MAX_PX = 480
+THUMB_QUALITY = 80
+
+_FIGURE_RE = re.compile(r"<figure\b.*?</figure\s*>", re.IGNORECASE | re.DOTALL)
+_IMG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_A_OPEN_RE = re.compile(r"<a\b[^>]*>", re.IGNORECASE)
+# <picture> sources; a browser would pick the template's photo from them.
+_SOURCE_RE = re.compile(r"\s*<source\b[^>]*>", re.IGNORECASE)
+_FIGCAPTION_RE = re.compile(
+    r"(<figcaption\b[^>]*>).*?(</figcaption\s*>)", re.IGNORECASE | re.DOTALL
+)
+_ATTR_RE = r"""\s{name}=(["'])[^"']*\1|\s{name}=[^\s>]+"""
+# Attributes on the template's <img> that name its photo (or another size
+# of it); a copied one would show the old photo on hi-DPI screens.
+_STALE_IMG_ATTRS = ("srcset", "sizes", "data-src", "data-srcset")
+
+
+def _set_attr(tag: str, name: str, value: str) -> str:
+    """`tag` with attribute `name` set to `value` (added if absent)."""
+    quoted = f'{name}="{html.escape(value, quote=True)}"'
+    pattern = re.compile(_ATTR_RE.format(name=re.escape(name)), re.IGNORECASE)
+    if pattern.search(tag):
+        return pattern.sub(lambda m: " " + quoted, tag, count=1)
+    closing = "/>" if tag.endswith("/>") else ">"
+    return f"{tag[: -len(closing)].rstrip()} {quoted}{closing}"
+
+
+def _drop_attr(tag: str, name: str) -> str:
+    """`tag` without attribute `name`."""
+    pattern = re.compile(_ATTR_RE.format(name=re.escape(name)), re.IGNORECASE)
+    return pattern.sub("", tag)
+
+
+def _thumbnail(source: Path, rel_source: str) -> tuple[str, int, int]:
+    """Write (or reuse) the thumbnail for `source`; returns its workspace
+    path and pixel size."""
+    workspace = current_workspace()
+    # images/2026/garden.png -> images/thumbs/2026/garden.png.jpg, so
+    # no two sources share a thumbnail.
+    under_images = Path(rel_source)
+    if under_images.parts[0] == "images":
+        under_images = under_images.relative_to("images")
+    name = under_images.name
+    if under_images.suffix.lower() not in {".jpg", ".jpeg"}:
+        name += ".jpg"
+    rel_thumb = str(Path(THUMBS_DIR) / under_images.with_name(name))
+    thumb = workspace / rel_thumb
+    Image = pil_image()
+    if not thumb.exists() or thumb.stat().st_mtime < source.stat().st_mtime:
+        thumb.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(source) as img:
+            img = pil_image_ops().exif_transpose(img)
+            img.thumbnail((THUMB_MAX_PX, THUMB_MAX_PX))
+            img.convert("RGB").save(thumb, format="JPEG", quality=THUMB_QUALITY)
+    with Image.open(thumb) as img:
+        width, height = img.size
+    return rel_thumb, width, height
+
+
+def _figure_for(
+    template: str,
+    full: str,
+    thumb: str,
+    size: tuple[int, int],
+    alt: str,
+    caption: str,
+) -> str:
+    img_match = _IMG_RE.search(template)
+    if img_match is None:
+        raise ValueError(f"the last <figure> in {GALLERY_PATH} has no <img> to copy")
+    img = img_match.group(0)
+    for name in _STALE_IMG_ATTRS:
+        img = _drop_attr(img, name)
+    img = _set_attr(img, "src", thumb)
+    img = _set_attr(img, "alt", alt)
+    img = _set_attr(img, "width", str(size[0]))
+    img = _set_attr(img, "height", str(size[1]))
+    img = _set_attr(img, "loading", "lazy")
+
+    link = _A_OPEN_RE.search(template)
+    if link is not None and link.start() < img_match.start():
+        figure = (
+            template[: link.start()]
+            + _set_attr(link.group(0), "href", full)
+            + template[link.end() : img_match.start()]
+            + img
+            + template[img_match.end() :]
+        )
+    else:
+        figure = (
+            template[: img_match.start()]
+            + f'<a href="{html.escape(full, quote=True)}">{img}</a>'
+            + template[img_match.end() :]
+        )
+    figure = _SOURCE_RE.sub("", figure)
+    return _FIGCAPTION_RE.sub(
+        lambda m: m.group(1) + html.escape(caption) + m.group(2), figure, count=1
+    )
+
+
+def add_gallery_items_impl(items: list[dict[str, str]]) -> dict[str, Any]:
+    if not items:
+        raise ValueError("items must not be empty")
+    gallery = validate_path(GALLERY_PATH)
+    if not gallery.exists():
+        raise FileNotFoundError(f"{GALLERY_PATH} does not exist")
+    page = gallery.read_text(encoding="utf-8")
+    figures = list(_FIGURE_RE.finditer(page))
+    if not figures:
+        raise ValueError(
+            f"{GALLERY_PATH} has no <figure> to use as a pattern; add the first "
+            "item with write_site_file"
+        )
+    last = figures[-1]
+
+    start = time.monotonic()
+    added = []
+    new_figures = []
+    for item in items:
+        rel_path, alt = item.get("path", ""), item.get("alt", "").strip()
+        if not alt:
+            raise ValueError(f"alt text is required for {rel_path!r}")
+        source = validate_path(rel_path)
+        if not source.is_file():
+            raise FileNotFoundError(f"no such image in the workspace: {rel_path!r}")
+        rel_source = str(source.relative_to(current_workspace()))
+        thumb, width, height = _thumbnail(source, rel_source)
+        new_figures.append(
+            _figure_for(
+                last.group(0),
+                rel_source,
+                thumb,
+                (width, height),
+                alt,
+                item.get("caption") or alt,
+            )
+        )
+        added.append({"path": rel_source, "thumb": thumb})
+
+    # Same line break / indent as before the template figure.
+    line_start = page.rfind("\n", 0, last.start()) + 1
+    indent = page[line_start : last.start()]
+    indent = indent if indent.isspace() else ""
+    insertion = "".join(f"\n{indent}{figure}" for figure in new_figures)
+    page = page[: last.end()] + insertion + page[last.end() :]
+    gallery.write_text(page, encoding="utf-8")
+
+    span = trace.get_current_span()
+    span.set_attribute("gallery.items_added", len(added))
+    span.set_attribute("gallery.thumbnail_ms", ms_since(start))
+    span.set_attribute("gallery.bytes", len(page.encode("utf-8")))
+    return {
+        "gallery": GALLERY_PATH,
+        "added": added,
+        "items_total": len(figures) + len(added),
+    }
+
+
+@tool
+def add_gallery_items(items: list[dict[str, str]]) -> dict[str, Any]:
+    """Add photos to the end of gallery.html, in the page's existing style,
+    with small lazy-loading thumbnails that link to the full image.
+
+    Use this instead of reading or rewriting gallery.html.
+
+    Args:
+        items: One dict per photo, in display order, with
+            path: the image's workspace path (e.g. "images/garden.jpg",
+                the `path` from parse_inbound's attachments),
+            alt: meaningful alt text,
+            caption: optional caption; defaults to the alt text.
+
+    Returns:
+        Dict with the thumbnails generated for each added path and the
+        gallery's new item count.
+    """
+    return add_gallery_items_impl(items)
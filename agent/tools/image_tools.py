@@ -0,0 +1,139 @@
+"""What the model needs to know about an image, without the image.
+
+Dimensions, format and size come from the file header (Pillow opens
+lazily) and EXIF from the same header block. The 64-bit difference hash
+needs pixels: a JPEG is decoded at 1/8 scale (draft mode), but PNG and
+HEIC have no draft mode and are decoded in full. For a 12MP photo that
+was ~0.1s for JPEG, ~0.4s for PNG and ~2.5s for HEIC on a dev machine.
+Results are cached by git blob sha, in memory and under
+/mnt/workspace/.cyndibot/image-info/, so that cost is paid once per
+image no matter how many emails ask about it.
+"""
+
+import subprocess
+import time
+from pathlib import Path
+from typing import Any
+
+from opentelemetry import trace
+from strands import tool
+
+from agent.observability import ms_since
+from agent.tools.blobs import BlobCache
+from agent.tools.images import pil_image
+from agent.tools.site_tools import STATE_DIR, current_workspace, validate_path
+
+IMAGE_INFO_DIR = STATE_DIR / "image-info"
+# Bump when the fields below change, so cached entries are recomputed.
+IMAGE_INFO_VERSION = 1
+
+_EXIF_ORIENTATION = 0x0112
+_EXIF_DATETIME = 0x0132
+_EXIF_IFD = 0x8769
+_EXIF_DATETIME_ORIGINAL = 0x9003
+_HASH_SIZE = 8
+
+_cache = BlobCache(IMAGE_INFO_VERSION)
+
+
+def _blob_shas(workspace: Path, paths: list[str]) -> list[str]:
+    """git blob sha of each file, hashed in one git process."""
+    out = subprocess.run(
+        ["git", "hash-object", "--stdin-paths"],
+        cwd=str(workspace),
+        input="\n".join(paths) + "\n",
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return out.split()
+
+
+def _dhash(img) -> str:
+    """Difference hash: 64 bits, one per adjacent-pixel brightness step in
+    a 9x8 grayscale thumbnail. Near-identical photos differ in a few bits."""
+    img.draft("L", (_HASH_SIZE * 4, _HASH_SIZE * 4))
+    small = img.convert("L").resize((_HASH_SIZE + 1, _HASH_SIZE))
+    px = small.load()
+    bits = 0
+    for y in range(_HASH_SIZE):
+        for x in range(_HASH_SIZE):
+            bits = (bits << 1) | (px[x, y] > px[x + 1, y])
+    return f"{bits:016x}"
+
+
+def _displayed_as(width: int, height: int, orientation: int) -> str:
+    # EXIF orientations 5-8 rotate the stored pixels by 90 degrees.
+    if orientation in {5, 6, 7, 8}:
+        width, height = height, width
+    if width == height:
+        return "square"
+    return "portrait" if height > width else "landscape"
+
+
+def _inspect(target: Path) -> dict[str, Any]:
+    with pil_image().open(target) as img:
+        exif = img.getexif()
+        taken = exif.get_ifd(_EXIF_IFD).get(_EXIF_DATETIME_ORIGINAL) or exif.get(
+            _EXIF_DATETIME
+        )
+        orientation = exif.get(_EXIF_ORIENTATION, 1)
+        width, height = img.size
+        info = {
+            "format": img.format,
+            "width": width,
+            "height": height,
+            "displayed_as": _displayed_as(width, height, orientation),
+            "exif_orientation": orientation,
+            "taken": str(taken).strip() if taken else None,
+        }
+        info["dhash"] = _dhash(img)
+    return info
+
+
+def image_info_impl(paths: list[str]) -> list[dict[str, Any]]:
+    if not paths:
+        raise ValueError("paths must not be empty")
+    workspace = current_workspace()
+    targets = [validate_path(p) for p in paths]
+    for path, target in zip(paths, targets):
+        if not target.is_file():
+            raise FileNotFoundError(f"no such file in the workspace: {path!r}")
+
+    start = time.monotonic()
+    hits = 0
+    results = []
+    for path, target, sha in zip(paths, targets, _blob_shas(workspace, paths)):
+        info = _cache.get(IMAGE_INFO_DIR, sha)
+        if info is None:
+            info = _cache.put(IMAGE_INFO_DIR, sha, _inspect(target))
+        else:
+            hits += 1
+        fields = {k: v for k, v in info.items() if k != "version"}
+        results.append({"path": path, "bytes": target.stat().st_size, **fields})
+
+    span = trace.get_current_span()
+    span.set_attribute("image_info.count", len(paths))
+    span.set_attribute("image_info.cache_hits", hits)
+    span.set_attribute("image_info.ms", ms_since(start))
+    return results
+
+
+@tool
+def image_info(paths: list[str]) -> list[dict[str, Any]]:
+    """Describe images in the workspace without putting their bytes in
+    the conversation: use this, never read_site_file, to look at anything
+    under images/. The first look at a large HEIC or PNG can take a few
+    seconds; repeat looks are instant.
+
+    Args:
+        paths: Workspace paths of the images (e.g. ["images/garden.jpg"]).
+
+    Returns:
+        One dict per path with format, width, height, bytes, displayed_as
+        (portrait / landscape / square, after EXIF rotation), taken (the
+        EXIF capture time, if any) and dhash, a 16-hex-digit perceptual
+        hash: two images whose dhashes differ in only a few bits are the
+        same photo, e.g. an attachment that's already on the site.
+    """
+    return image_info_impl(paths)
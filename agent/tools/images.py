@@ -0,0 +1,22 @@
+"""Pillow, loaded on first use so emails without images never pay for
+importing it (or libheif)."""
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def pil_image():
+    """PIL.Image with the HEIF opener registered."""
+    import pillow_heif
+    from PIL import Image
+
+    pillow_heif.register_heif_opener()
+    return Image
+
+
+@lru_cache(maxsize=None)
+def pil_image_ops():
+    pil_image()
+    from PIL import ImageOps
+
+    return ImageOps
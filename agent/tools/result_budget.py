@@ -0,0 +1,271 @@
+"""Keep large tool results from flooding the model's context window.
+
+Every tool result stays in the conversation for the rest of the run, so
+one big page or email thread makes every later Bedrock turn slower and
+more expensive. shape_result() caps each result at a per-tool budget and
+all results between two model calls at a shared turn budget. Whatever
+doesn't fit is stashed under a handle that the model can page through
+with read_tool_result.
+"""
+
+import json
+import secrets
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any
+
+from opentelemetry import trace
+from strands import tool
+from strands.hooks import (
+    BeforeInvocationEvent,
+    BeforeModelCallEvent,
+    HookProvider,
+    HookRegistry,
+)
+
+# Sizes are bytes of the JSON text Strands hands to the model (strings go
+# through as-is). Roughly 4 bytes per token for English and HTML.
+TOOL_BUDGET_BYTES = {
+    "read_site_file": 24_000,
+    "list_site_files": 6_000,
+    "parse_inbound": 12_000,
+}
+DEFAULT_TOOL_BUDGET_BYTES = 16_000
+TURN_BUDGET_BYTES = 40_000
+# Even with the turn budget spent, a result keeps this much so the model
+# can tell what it got and where to page from.
+MIN_RESULT_BYTES = 1_500
+PAGE_BYTES = 16_000
+# Fields up to this size are left whole when a dict result is elided.
+MIN_ELIDED_FIELD_BYTES = 500
+BYTES_PER_TOKEN = 4
+
+_current: ContextVar["ResultBudget | None"] = ContextVar(
+    "cyndibot_result_budget", default=None
+)
+
+
+class ResultBudget:
+    """Byte accounting and stash for one agent invocation."""
+
+    def __init__(self, turn_bytes: int = TURN_BUDGET_BYTES):
+        self.turn_bytes = turn_bytes
+        self.turn_used = 0
+        self._stash: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def start_turn(self) -> None:
+        with self._lock:
+            self.turn_used = 0
+
+    def allowance(self, tool_name: str) -> int:
+        per_tool = TOOL_BUDGET_BYTES.get(tool_name, DEFAULT_TOOL_BUDGET_BYTES)
+        with self._lock:
+            remaining = self.turn_bytes - self.turn_used
+        return max(min(per_tool, remaining), MIN_RESULT_BYTES)
+
+    def charge(self, n_bytes: int) -> None:
+        with self._lock:
+            self.turn_used += n_bytes
+
+    def stash(self, text: str) -> str:
+        handle = f"r-{secrets.token_hex(4)}"
+        with self._lock:
+            self._stash[handle] = text
+        return handle
+
+    def stashed(self, handle: str) -> str:
+        with self._lock:
+            if handle not in self._stash:
+                raise KeyError(f"unknown or expired result handle: {handle!r}")
+            return self._stash[handle]
+
+
+class ResultBudgetHooks(HookProvider):
+    """Start a fresh budget per invocation and a fresh turn per model call.
+
+    The budget lives in a ContextVar set from the invocation's own task,
+    so the tool tasks and threads Strands spawns afterwards inherit it and
+    concurrent agents never share one.
+    """
+
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        registry.add_callback(BeforeInvocationEvent, self._start_invocation)
+        registry.add_callback(BeforeModelCallEvent, self._start_turn)
+
+    def _start_invocation(self, event: BeforeInvocationEvent) -> None:
+        _current.set(ResultBudget())
+
+    def _start_turn(self, event: BeforeModelCallEvent) -> None:
+        _budget().start_turn()
+
+
+def _budget() -> ResultBudget:
+    budget = _current.get()
+    if budget is None:
+        budget = ResultBudget()
+        _current.set(budget)
+    return budget
+
+
+def _size(value: Any) -> int:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return len(text.encode("utf-8"))
+
+
+def _head(text: str, max_bytes: int) -> str:
+    """Longest prefix of `text` within max_bytes, preferring a line break."""
+    head = text.encode("utf-8")[: max(max_bytes, 0)].decode("utf-8", errors="ignore")
+    if len(head) == len(text):
+        return head
+    cut = head.rfind("\n")
+    if cut > len(head) * 0.8:
+        head = head[: cut + 1]
+    return head
+
+
+def _elision_note(handle: str, offset: int, remaining_bytes: int) -> str:
+    return (
+        f"[... {remaining_bytes} more bytes elided. Call "
+        f'read_tool_result(handle="{handle}", offset={offset}) to continue.]'
+    )
+
+
+def _elide_text(text: str, allowance: int, budget: ResultBudget) -> str:
+    handle = budget.stash(text)
+    head = _head(text, allowance - 200)
+    remaining = len(text.encode("utf-8")) - len(head.encode("utf-8"))
+    return head + "\n" + _elision_note(handle, len(head), remaining)
+
+
+def _elide_list(items: list, allowance: int, budget: ResultBudget) -> list:
+    handle = budget.stash("\n".join(str(i) for i in items))
+    kept: list = []
+    used = 2
+    for item in items:
+        item_bytes = len(json.dumps(item, ensure_ascii=False).encode("utf-8")) + 2
+        if used + item_bytes > allowance - 600:
+            break
+        kept.append(item)
+        used += item_bytes
+    rest = items[len(kept) :]
+    by_dir = Counter(
+        str(i).split("/", 1)[0] + "/" if "/" in str(i) else "(root)" for i in rest
+    )
+    summary = ", ".join(f"{d}: {n}" for d, n in by_dir.most_common(8))
+    offset = len("\n".join(str(i) for i in kept)) + (1 if kept else 0)
+    note = _elision_note(handle, offset, _size(rest))
+    return [*kept, f"{len(rest)} more entries not shown ({summary}). {note}"]
+
+
+def _elide_dict(result: dict, allowance: int, budget: ResultBudget) -> dict:
+    shaped = dict(result)
+    # Shrink the largest string and list fields first; those are the
+    # bodies, file contents and listings. Small fields -- ids, cursors,
+    # counts -- are never touched: the model needs them intact to act on
+    # the result.
+    fields = sorted(
+        (
+            k
+            for k, v in shaped.items()
+            if isinstance(v, (str, list)) and _size(v) > MIN_ELIDED_FIELD_BYTES
+        ),
+        key=lambda k: _size(shaped[k]),
+        reverse=True,
+    )
+    for key in fields:
+        overflow = _size(shaped) - allowance
+        if overflow <= 0:
+            break
+        value = shaped[key]
+        if isinstance(value, list):
+            shaped[key] = _elide_list(value, _size(value) - overflow, budget)
+            continue
+        keep = max(len(value.encode("utf-8")) - overflow - 200, 0)
+        handle = budget.stash(value)
+        head = _head(value, keep)
+        remaining = len(value.encode("utf-8")) - len(head.encode("utf-8"))
+        shaped[key] = head + "\n" + _elision_note(handle, len(head), remaining)
+    return shaped
+
+
+def shape_result(tool_name: str, result: Any) -> Any:
+    """Return `result`, elided if it's over this tool's or this turn's budget.
+
+    Stamps tool.result.* attributes on the current (execute_tool) span.
+    """
+    budget = _budget()
+    original_bytes = _size(result)
+    allowance = budget.allowance(tool_name)
+
+    if original_bytes <= allowance:
+        shaped = result
+    elif isinstance(result, str):
+        shaped = _elide_text(result, allowance, budget)
+    elif isinstance(result, list):
+        shaped = _elide_list(result, allowance, budget)
+    elif isinstance(result, dict):
+        shaped = _elide_dict(result, allowance, budget)
+    else:
+        shaped = _elide_text(json.dumps(result, ensure_ascii=False), allowance, budget)
+
+    returned_bytes = original_bytes if shaped is result else _size(shaped)
+    budget.charge(returned_bytes)
+
+    span = trace.get_current_span()
+    span.set_attribute("tool.result.bytes", original_bytes)
+    span.set_attribute("tool.result.returned_bytes", returned_bytes)
+    span.set_attribute("tool.result.tokens_est", returned_bytes // BYTES_PER_TOKEN)
+    span.set_attribute("tool.result.budget_bytes", allowance)
+    span.set_attribute("tool.result.truncated", shaped is not result)
+    return shaped
+
+
+def result_allowance(tool_name: str) -> int:
+    """Bytes a result from `tool_name` can take right now without being
+    elided, for tools that can size their own results (and so keep
+    cursors and counts consistent with what the model sees)."""
+    return _budget().allowance(tool_name)
+
+
+def read_tool_result_impl(handle: str, offset: int = 0) -> dict[str, Any]:
+    budget = _budget()
+    text = budget.stashed(handle)
+    if offset < 0 or offset > len(text):
+        raise ValueError(f"offset {offset} out of range for {handle!r} (0..{len(text)})")
+    page_bytes = min(PAGE_BYTES, budget.allowance("read_tool_result") - 300)
+    chunk = _head(text[offset:], page_bytes)
+    next_offset = offset + len(chunk)
+    budget.charge(len(chunk.encode("utf-8")))
+
+    span = trace.get_current_span()
+    span.set_attribute("tool.result.handle", handle)
+    span.set_attribute("tool.result.returned_bytes", len(chunk.encode("utf-8")))
+    return {
+        "handle": handle,
+        "offset": offset,
+        "text": chunk,
+        "next_offset": next_offset if next_offset < len(text) else None,
+        "total_chars": len(text),
+    }
+
+
+@tool
+def read_tool_result(handle: str, offset: int = 0) -> dict[str, Any]:
+    """Read more of a tool result that was too large to return in full.
+
+    When a result is cut short it ends with a note like
+    [... N more bytes elided. Call read_tool_result(handle="r-...", offset=K)
+    to continue.] Only call this if you actually need the elided part.
+
+    Args:
+        handle: The handle from the elision note.
+        offset: Character offset to continue from, taken from the note or
+            from a previous call's next_offset.
+
+    Returns:
+        Dict with text (the next page), next_offset (None when there's no
+        more), and total_chars.
+    """
+    return read_tool_result_impl(handle, offset)
@@ -0,0 +1,221 @@
+"""What visitors download, built from what people edit.
+
+The site's source on main stays hand-editable. When a deploy branch is
+configured, each publish also commits a build of main to it: stylesheets
+minified, and every <link href> / <script src> to a local CSS or JS file
+given a ?v=<content hash> query, so browsers can cache them for good and
+still see a change the moment it's published. GitHub Pages serves the
+deploy branch.
+
+The build never touches a working tree: it's assembled in a throwaway
+index from main's tree plus the rewritten blobs. Each rewrite is keyed
+by the repo it was written to and the blob sha it came from (and, for
+pages, the versions of the assets they load), in memory and under
+/mnt/workspace/.cyndibot/build/, so a publish only minifies or rewrites
+what actually changed.
+"""
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any
+
+from agent.tools.blobs import BlobCache, read_blobs
+from agent.tools.site_refs import CSS_SUFFIXES, HTML_SUFFIXES, resolve_ref
+
+# Bump when minify_css or the page rewrite change, so cached outputs are
+# rebuilt.
+BUILD_VERSION = 1
+JS_SUFFIXES = {".js"}
+
+_CSS_TOKEN_RE = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/""", re.DOTALL
+)
+_ASSET_TAG_RE = re.compile(r"<(?:link|script)\b[^>]*>", re.IGNORECASE)
+_ASSET_ATTR_RE = re.compile(
+    r"""(\s(?:href|src)=)(["']?)([^"'\s>]+)\2""", re.IGNORECASE
+)
+
+_cache = BlobCache(BUILD_VERSION)
+
+
+def _squeeze(css: str) -> str:
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}")
+
+
+def minify_css(css: str) -> str:
+    """`css` without comments and optional whitespace. Strings are kept
+    as written."""
+    out = []
+    pos = 0
+    for m in _CSS_TOKEN_RE.finditer(css):
+        out.append(_squeeze(css[pos : m.start()]))
+        if m.group(1):
+            out.append(m.group(1))
+        pos = m.end()
+    out.append(_squeeze(css[pos:]))
+    return "".join(out).strip() + "\n"
+
+
+def _git(repo: Path, *args: str, input: str | None = None, env=None) -> str:
+    return subprocess.run(
+        ["git", *args],
+        cwd=str(repo),
+        input=input,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+def _write_blob(repo: Path, text: str) -> dict[str, Any]:
+    sha = _git(repo, "hash-object", "-w", "--stdin", input=text).strip()
+    return {"sha": sha, "bytes": len(text.encode("utf-8"))}
+
+
+def _repo_cache_dir(repo: Path, cache_dir: Path) -> Path:
+    """Where `repo`'s outputs are cached. They're blobs written to that
+    repo's object store, so a pooled worktree never picks up another
+    tree's output."""
+    return cache_dir / hashlib.sha1(str(repo).encode()).hexdigest()[:12]
+
+
+def _asset_refs(text: str) -> list[str]:
+    """The href/src values of a page's <link> and <script> tags."""
+    return [
+        m.group(3)
+        for tag in _ASSET_TAG_RE.findall(text)
+        for m in _ASSET_ATTR_RE.finditer(tag)
+    ]
+
+
+def _versioned_page(text: str, rel_path: str, versions: dict[str, str]) -> str:
+    def version(m: re.Match) -> str:
+        url = m.group(3)
+        target = resolve_ref(url, rel_path)
+        if target not in versions:
+            return m.group(0)
+        bare = url.split("#", 1)[0].split("?", 1)[0]
+        return f"{m.group(1)}{m.group(2)}{bare}?v={versions[target]}{m.group(2)}"
+
+    return _ASSET_TAG_RE.sub(lambda t: _ASSET_ATTR_RE.sub(version, t.group(0)), text)
+
+
+def build_commit(
+    repo: Path, source: str, parent: str | None, cache_dir: Path
+) -> dict[str, Any]:
+    """Commit the build of `source` on top of `parent` (the deploy branch
+    head, if there is one) in `repo`, without pushing. When the build is
+    identical to `parent`'s tree, `parent` itself is returned."""
+    repo = repo.resolve()
+    entries = _repo_cache_dir(repo, cache_dir)
+    source = _git(repo, "rev-parse", source).strip()
+    blobs: dict[str, tuple[str, int]] = {}
+    listing = _git(repo, "ls-tree", "-r", "-l", "-z", source).split("\0")
+    for entry in filter(None, listing):
+        meta, rel_path = entry.split("\t", 1)
+        _, kind, sha, size = meta.split()
+        if kind == "blob":
+            blobs[rel_path] = (sha, int(size))
+
+    def of_kind(suffixes: set[str]) -> dict[str, str]:
+        return {
+            p: sha
+            for p, (sha, _) in blobs.items()
+            if Path(p).suffix.lower() in suffixes
+        }
+
+    css, js, pages = of_kind(CSS_SUFFIXES), of_kind(JS_SUFFIXES), of_kind(HTML_SUFFIXES)
+    outputs: dict[str, dict[str, Any]] = {}
+    computed = 0
+
+    css_todo = [s for s in set(css.values()) if not _cache.get(entries, f"css-{s}")]
+    for sha, text in read_blobs(repo, css_todo).items():
+        _cache.put(entries, f"css-{sha}", _write_blob(repo, minify_css(text)))
+        computed += 1
+    for rel_path, sha in css.items():
+        outputs[rel_path] = _cache.get(entries, f"css-{sha}")
+    versions = {p: outputs[p]["sha"][:10] for p in css}
+    versions.update({p: sha[:10] for p, sha in js.items()})
+
+    texts = read_blobs(
+        repo,
+        [s for s in set(pages.values()) if not _cache.get(entries, f"assets-{s}")],
+    )
+    for sha, text in texts.items():
+        _cache.put(entries, f"assets-{sha}", {"refs": _asset_refs(text)})
+    page_keys = {}
+    for rel_path, sha in pages.items():
+        targets = [
+            resolve_ref(ref, rel_path)
+            for ref in _cache.get(entries, f"assets-{sha}")["refs"]
+        ]
+        loaded = [(t, versions[t]) for t in targets if t in versions]
+        if loaded:
+            fingerprint = hashlib.sha1(json.dumps(loaded).encode()).hexdigest()[:12]
+            page_keys[rel_path] = f"page-{sha}-{fingerprint}"
+    todo = {
+        pages[p]
+        for p, key in page_keys.items()
+        if not _cache.get(entries, key) and pages[p] not in texts
+    }
+    texts.update(read_blobs(repo, sorted(todo)))
+    for rel_path, key in page_keys.items():
+        if not _cache.get(entries, key):
+            text = _versioned_page(texts[pages[rel_path]], rel_path, versions)
+            _cache.put(entries, key, _write_blob(repo, text))
+            computed += 1
+        outputs[rel_path] = _cache.get(entries, key)
+
+    changed = {p: out for p, out in outputs.items() if out["sha"] != blobs[p][0]}
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    index = cache_dir / f"index.{threading.get_ident()}"
+    env = {**os.environ, "GIT_INDEX_FILE": str(index)}
+    try:
+        _git(repo, "read-tree", source, env=env)
+        if changed:
+            _git(
+                repo,
+                "update-index",
+                "--index-info",
+                input="".join(
+                    f"100644 {out['sha']}\t{p}\n" for p, out in changed.items()
+                ),
+                env=env,
+            )
+        tree = _git(repo, "write-tree", env=env).strip()
+    finally:
+        index.unlink(missing_ok=True)
+
+    if parent and _git(repo, "rev-parse", f"{parent}^{{tree}}").strip() == tree:
+        commit = parent
+    else:
+        commit = _git(
+            repo,
+            "commit-tree",
+            tree,
+            *(["-p", parent] if parent else []),
+            "-m",
+            f"Build of {source[:7]}",
+        ).strip()
+
+    assets = set(css) | set(js) | set(pages)
+    return {
+        "commit": commit,
+        "source": source,
+        "up_to_date": commit == parent,
+        "files_rewritten": len(changed),
+        "outputs_computed": computed,
+        "bytes_before": sum(blobs[p][1] for p in assets),
+        "bytes_after": sum(
+            outputs[p]["bytes"] if p in outputs else blobs[p][1] for p in assets
+        ),
+    }
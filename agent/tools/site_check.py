@@ -0,0 +1,240 @@
+"""Catch broken pages before they're committed, not after Pages deploys.
+
+Only what's staged is looked at: each added or modified HTML file is
+checked for unbalanced tags, and each added or modified HTML or CSS
+file for local src/href/url() targets that don't exist. Deleting a file
+also flags the pages that still point at it. A problem that was already
+there in the committed version of the file isn't reported, so an old
+broken link doesn't block an unrelated edit.
+
+Parses are keyed by git blob sha and kept in memory and under
+/mnt/workspace/.cyndibot/page-checks/, so a page is parsed once per
+version and validation cost follows the size of the change.
+"""
+
+import subprocess
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from agent.tools.blobs import BlobCache, read_blobs
+from agent.tools.site_refs import (
+    CSS_SUFFIXES,
+    HTML_SUFFIXES,
+    RefCollector,
+    css_refs,
+    resolve_ref,
+)
+
+# Bump when _CheckingParser changes, so cached parses are redone.
+CHECK_VERSION = 1
+
+# Elements that never have an end tag, and those whose end tag HTML
+# lets you leave out.
+_VOID = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "source", "track", "wbr",
+}
+_OPTIONAL_END = {
+    "body", "colgroup", "dd", "dt", "head", "html", "li", "optgroup",
+    "option", "p", "rb", "rp", "rt", "rtc", "tbody", "td", "tfoot", "th",
+    "thead", "tr",
+}
+_EMPTY_SHA = "0" * 40
+
+_cache = BlobCache(CHECK_VERSION)
+
+
+class _CheckingParser(RefCollector):
+    """The reference collector, also noting each ref's line and any tags
+    that don't balance."""
+
+    def __init__(self):
+        super().__init__()
+        self.ref_lines: list[int] = []
+        self.problems: list[dict[str, Any]] = []
+        self._open: list[tuple[str, int]] = []
+
+    def handle_starttag(self, tag, attrs):
+        before = len(self.refs)
+        super().handle_starttag(tag, attrs)
+        line = self.getpos()[0]
+        self.ref_lines.extend([line] * (len(self.refs) - before))
+        if tag not in _VOID:
+            self._open.append((tag, line))
+
+    def handle_startendtag(self, tag, attrs):
+        before = len(self.refs)
+        super().handle_starttag(tag, attrs)
+        self.ref_lines.extend([self.getpos()[0]] * (len(self.refs) - before))
+
+    def handle_endtag(self, tag):
+        super().handle_endtag(tag)
+        line = self.getpos()[0]
+        if tag in _VOID:
+            return
+        if not any(open_tag == tag for open_tag, _ in self._open):
+            self.problems.append({"line": line, "problem": f"stray </{tag}>"})
+            return
+        while True:
+            open_tag, opened = self._open.pop()
+            if open_tag == tag:
+                return
+            if open_tag not in _OPTIONAL_END:
+                self.problems.append(
+                    {
+                        "line": opened,
+                        "problem": f"<{open_tag}> not closed before </{tag}>",
+                    }
+                )
+
+    def handle_data(self, data):
+        before = len(self.refs)
+        super().handle_data(data)
+        self.ref_lines.extend([self.getpos()[0]] * (len(self.refs) - before))
+
+    def result(self) -> dict[str, Any]:
+        for tag, opened in self._open:
+            if tag not in _OPTIONAL_END:
+                self.problems.append(
+                    {"line": opened, "problem": f"<{tag}> never closed"}
+                )
+        return {
+            "refs": list(zip(self.ref_lines, self.refs)),
+            "problems": self.problems,
+        }
+
+
+def _check_text(rel_path: str, text: str) -> dict[str, Any]:
+    if Path(rel_path).suffix.lower() in CSS_SUFFIXES:
+        refs = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            refs.extend((number, ref) for ref in css_refs(line))
+        return {"refs": refs, "problems": []}
+    parser = _CheckingParser()
+    parser.feed(text)
+    parser.close()
+    return parser.result()
+
+
+def _checks(
+    workspace: Path, cache_dir: Path, blobs: dict[str, str]
+) -> tuple[dict[str, dict[str, Any]], int]:
+    """Parse results for each {sha: path}; returns them and how many had
+    to be parsed (the rest came from the cache)."""
+    checks = {}
+    missing = []
+    for sha in blobs:
+        check = _cache.get(cache_dir, sha)
+        if check is None:
+            missing.append(sha)
+        else:
+            checks[sha] = check
+    if missing:
+        for sha, text in read_blobs(workspace, missing).items():
+            checks[sha] = _cache.put(cache_dir, sha, _check_text(blobs[sha], text))
+    return checks, len(missing)
+
+
+def _exists(target: str, files: set[str]) -> bool:
+    # GitHub Pages also serves foo/index.html for foo and foo.html for foo.
+    return (
+        target in files
+        or f"{target}/index.html" in files
+        or f"{target}.html" in files
+    )
+
+
+def _missing_refs(
+    check: dict[str, Any], rel_path: str, files: set[str]
+) -> list[tuple[int, str]]:
+    missing = []
+    for line, ref in check["refs"]:
+        target = resolve_ref(ref, rel_path)
+        if target is not None and not _exists(target, files):
+            missing.append((line, ref))
+    return missing
+
+
+def validate_staged(workspace: Path, cache_dir: Path) -> dict[str, Any]:
+    """Problems the staged changes would introduce, as
+    {problems: [{file, line, problem, ref?}], checked, parsed}."""
+    raw = subprocess.run(
+        ["git", "diff", "--cached", "--raw", "--no-abbrev", "--no-renames", "-z"],
+        cwd=str(workspace),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split("\0")
+    staged = subprocess.run(
+        ["git", "ls-files", "-s", "-z"],
+        cwd=str(workspace),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split("\0")
+    index = {}
+    for entry in filter(None, staged):
+        meta, rel_path = entry.split("\t", 1)
+        index[rel_path] = meta.split()[1]
+    files = set(index)
+
+    checkable = HTML_SUFFIXES | CSS_SUFFIXES
+    changed: dict[str, tuple[str, str]] = {}
+    deleted = set()
+    for meta, rel_path in zip(raw[0::2], raw[1::2]):
+        _, _, old_sha, new_sha, status = meta.split()
+        if status == "D":
+            deleted.add(rel_path)
+        elif Path(rel_path).suffix.lower() in checkable:
+            changed[rel_path] = (old_sha, new_sha)
+
+    blobs = {}
+    for rel_path, (old_sha, new_sha) in changed.items():
+        blobs[new_sha] = rel_path
+        if old_sha != _EMPTY_SHA:
+            blobs[old_sha] = rel_path
+    if deleted:
+        # Unchanged pages that may point at what's gone.
+        for rel_path, sha in index.items():
+            if Path(rel_path).suffix.lower() in checkable:
+                blobs.setdefault(sha, rel_path)
+    checks, parsed = _checks(workspace, cache_dir, blobs)
+
+    problems = []
+    for rel_path, (old_sha, new_sha) in sorted(changed.items()):
+        new, old = checks[new_sha], checks.get(old_sha)
+        known = Counter(p["problem"] for p in old["problems"]) if old else Counter()
+        for problem in new["problems"]:
+            if known[problem["problem"]]:
+                known[problem["problem"]] -= 1
+                continue
+            problems.append({"file": rel_path, **problem})
+        known_refs = (
+            {ref for _, ref in _missing_refs(old, rel_path, files)} if old else set()
+        )
+        for line, ref in _missing_refs(new, rel_path, files):
+            if ref not in known_refs:
+                problems.append(
+                    {
+                        "file": rel_path,
+                        "line": line,
+                        "problem": "missing target",
+                        "ref": ref,
+                    }
+                )
+    if deleted:
+        for rel_path, sha in sorted(index.items()):
+            if rel_path in changed or sha not in checks:
+                continue
+            for line, ref in checks[sha]["refs"]:
+                if resolve_ref(ref, rel_path) in deleted:
+                    problems.append(
+                        {
+                            "file": rel_path,
+                            "line": line,
+                            "problem": "points at a deleted file",
+                            "ref": ref,
+                        }
+                    )
+    return {"problems": problems, "checked": len(changed), "parsed": parsed}
@@ -0,0 +1,115 @@
+"""Which site files the site's HTML and CSS point at.
+
+Pages reference images, stylesheets and other pages through src, href,
+srcset and poster attributes, inline style="" and <style> blocks, and
+stylesheets through url() and @import. References are resolved to
+workspace-relative paths; anything with a scheme or host (https:,
+mailto:, data:, //cdn...) isn't a site file and is skipped.
+"""
+
+import posixpath
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+HTML_SUFFIXES = {".html", ".htm"}
+CSS_SUFFIXES = {".css"}
+
+_URL_ATTRS = {"src", "href", "poster", "data-src"}
+_SRCSET_ATTRS = {"srcset", "data-srcset"}
+_CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)(.*?)\1\s*\)""", re.IGNORECASE)
+_CSS_IMPORT_RE = re.compile(r"""@import\s+(['"])(.*?)\1""", re.IGNORECASE)
+
+
+def css_refs(css: str) -> list[str]:
+    return [m.group(2) for m in _CSS_URL_RE.finditer(css)] + [
+        m.group(2) for m in _CSS_IMPORT_RE.finditer(css)
+    ]
+
+
+def _srcset_refs(srcset: str) -> list[str]:
+    return [c.split()[0] for c in srcset.split(",") if c.strip()]
+
+
+class RefCollector(HTMLParser):
+    """Collects the raw reference strings in a page: URL and srcset
+    attributes, and url()/@import in style attributes and <style> blocks.
+    site_check subclasses it to check tag balance in the same pass."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.refs: list[str] = []
+        self._in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if not value:
+                continue
+            if name in _URL_ATTRS:
+                self.refs.append(value)
+            elif name in _SRCSET_ATTRS:
+                self.refs.extend(_srcset_refs(value))
+            elif name == "style":
+                self.refs.extend(css_refs(value))
+        if tag == "style":
+            self._in_style = True
+
+    def handle_endtag(self, tag):
+        if tag == "style":
+            self._in_style = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            self.refs.extend(css_refs(data))
+
+
+def html_refs(html: str) -> list[str]:
+    collector = RefCollector()
+    collector.feed(html)
+    collector.close()
+    return collector.refs
+
+
+def file_refs(rel_path: str, text: str) -> list[str]:
+    """Raw reference strings in one HTML or CSS file; [] for other kinds."""
+    suffix = Path(rel_path).suffix.lower()
+    if suffix in HTML_SUFFIXES:
+        return html_refs(text)
+    if suffix in CSS_SUFFIXES:
+        return css_refs(text)
+    return []
+
+
+def resolve_ref(ref: str, from_path: str) -> str | None:
+    """The workspace-relative path `ref` points at, as seen from the file
+    at `from_path`. None for external URLs and same-page anchors."""
+    parts = urlsplit(ref.strip())
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if path.startswith("/"):
+        joined = path.lstrip("/")
+    else:
+        joined = posixpath.join(posixpath.dirname(from_path), path)
+    resolved = posixpath.normpath(joined)
+    if resolved.startswith("../") or resolved == "..":
+        return None
+    if path.endswith("/") or posixpath.basename(path) in {".", ".."}:
+        # A directory: the site root normalizes to ".", not "".
+        resolved = posixpath.join("" if resolved == "." else resolved, "index.html")
+    return resolved
+
+
+def referenced_paths(workspace: Path, files: list[str]) -> set[str]:
+    """Every workspace path referenced from the HTML and CSS among `files`."""
+    referenced: set[str] = set()
+    for rel_path in files:
+        if Path(rel_path).suffix.lower() not in HTML_SUFFIXES | CSS_SUFFIXES:
+            continue
+        text = (workspace / rel_path).read_text(encoding="utf-8", errors="replace")
+        for ref in file_refs(rel_path, text):
+            resolved = resolve_ref(ref, rel_path)
+            if resolved is not None:
+                referenced.add(resolved)
+    return referenced
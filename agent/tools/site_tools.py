@@ -1,12 +1,31 @@
 """Tools the agent uses to read + edit Cyndi's static site."""
 
+import atexit
+import fcntl
+import fnmatch
+import json
+import logging
 import os
 import subprocess
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
 from typing import Any
 
+from opentelemetry import trace
 from strands import tool
 
+from agent.aws_clients import s3_client
+from agent.github_token import git_auth, github_token, is_auth_failure
+from agent.observability import ms_since
+from agent.tools.result_budget import result_allowance, shape_result
+from agent.tools.site_build import build_commit
+from agent.tools.site_check import validate_staged
+from agent.tools.site_refs import referenced_paths
+
 WORKSPACE_DIR = Path(
     os.environ.get("CYNDIBOT_WORKSPACE", "cynditaylor-com")
 ).resolve()
@@ -17,12 +36,110 @@ GIT_USER_NAME = os.environ.get("CYNDIBOT_GIT_USER_NAME", "Cyndibot")
 GIT_USER_EMAIL = os.environ.get(
     "CYNDIBOT_GIT_USER_EMAIL", "bot@cyndibot.jessitron.honeydemo.io"
 )
+# 0 keeps the single clone at WORKSPACE_DIR. N > 0 switches to a shared
+# bare mirror with up to N git worktrees, one leased per invocation.
+WORKTREE_POOL_SIZE = int(os.environ.get("CYNDIBOT_WORKTREE_POOL_SIZE", "0"))
+MIRROR_DIR = WORKSPACE_DIR.parent / f"{WORKSPACE_DIR.name}.git"
+WORKTREES_DIR = WORKSPACE_DIR.parent / "worktrees"
+
+# A git bundle of origin/main that a fresh microVM restores with one
+# sequential read before topping up with a small fetch, instead of a full
+# clone. Refreshed in the background once it's older than the max age.
+# With CYNDIBOT_SNAPSHOT_S3_URI set it's also uploaded there, so it
+# survives the session storage itself being empty.
+SNAPSHOT_PATH = Path(
+    os.environ.get(
+        "CYNDIBOT_SNAPSHOT_PATH",
+        str(WORKSPACE_DIR.parent / ".snapshots" / f"{WORKSPACE_DIR.name}.bundle"),
+    )
+)
+SNAPSHOT_S3_URI = os.environ.get("CYNDIBOT_SNAPSHOT_S3_URI", "")
+SNAPSHOT_MAX_AGE_SECONDS = float(
+    os.environ.get("CYNDIBOT_SNAPSHOT_MAX_AGE_HOURS", "24")
+) * 3600
+
+# "immediate": publish_site_changes pushes right away. "deferred": it
+# queues the commit on PENDING_REF and a background publisher pushes
+# everything queued once per window, so a flurry of emails becomes one
+# GitHub Pages deploy and no push sits on the critical path before the
+# reply.
+PUBLISH_MODE = os.environ.get("CYNDIBOT_PUBLISH_MODE", "immediate")
+if PUBLISH_MODE not in {"immediate", "deferred"}:
+    raise ValueError(
+        f"CYNDIBOT_PUBLISH_MODE must be immediate or deferred: {PUBLISH_MODE!r}"
+    )
+PUBLISH_WINDOW_SECONDS = float(os.environ.get("CYNDIBOT_PUBLISH_WINDOW_SECONDS", "60"))
+# Background publishes that may fail in a row before the publisher stops
+# retrying on its own; the queue is kept and the failure is reported to
+# the next publish_site_changes.
+PUBLISH_MAX_FAILURES = int(os.environ.get("CYNDIBOT_PUBLISH_MAX_FAILURES", "3"))
+# Push attempts before giving up when origin/main keeps moving underneath.
+PUSH_ATTEMPTS = int(os.environ.get("CYNDIBOT_PUSH_ATTEMPTS", "3"))
+PENDING_REF = "refs/cyndibot/pending"
+# Queued commits that conflict with origin/main are moved off PENDING_REF
+# to <prefix><sha>, so workspaces synced afterwards start from origin/main.
+CONFLICTED_REF_PREFIX = "refs/cyndibot/conflicted/"
+# Unset: GitHub Pages serves main as written. Set: every publish also
+# force-pushes a build of main (CSS minified, CSS/JS references
+# content-hashed; see site_build) to this branch, and Pages should be
+# pointed at it.
+DEPLOY_BRANCH = os.environ.get("CYNDIBOT_DEPLOY_BRANCH", "")
+PUBLISH_WORKTREE = WORKSPACE_DIR.parent / f".{WORKSPACE_DIR.name}-publish"
+# Caches derived from the site (digests, image metadata) that should
+# survive across invocations but aren't part of the repo.
+STATE_DIR = WORKSPACE_DIR.parent / ".cyndibot"
+PAGE_CHECK_DIR = STATE_DIR / "page-checks"
+BUILD_DIR = STATE_DIR / "build"
+
+logger = logging.getLogger(__name__)
+
+_current_workspace: ContextVar[Path] = ContextVar(
+    "cyndibot_workspace", default=WORKSPACE_DIR
+)
+# Set for replays: changes are committed locally but never pushed, and
+# replies are never sent.
+_dry_run: ContextVar[bool] = ContextVar("cyndibot_dry_run", default=False)
+
+
+def current_workspace() -> Path:
+    """The working tree this invocation's tools read and write."""
+    return _current_workspace.get()
+
+
+@contextmanager
+def using_workspace(workspace: Path) -> Iterator[Path]:
+    token = _current_workspace.set(workspace)
+    try:
+        yield workspace
+    finally:
+        _current_workspace.reset(token)
+
+
+def is_dry_run() -> bool:
+    return _dry_run.get()
+
+
+@contextmanager
+def dry_run() -> Iterator[None]:
+    token = _dry_run.set(True)
+    try:
+        yield
+    finally:
+        _dry_run.reset(token)
+
 
+# Subcommands that talk to origin and so need the GitHub token.
+_REMOTE_GIT_COMMANDS = {"clone", "fetch", "ls-remote", "pull", "push"}
 
-def _run_git(*args: str, cwd: Path | None = None) -> str:
+
+def run_git(*args: str, cwd: Path | None = None) -> str:
+    """Run git in `cwd` (the current workspace by default) and return its
+    stdout, with GitHub auth added for commands that talk to origin."""
+    auth_args, auth_env = git_auth() if args[0] in _REMOTE_GIT_COMMANDS else ([], {})
     result = subprocess.run(
-        ["git", *args],
-        cwd=str(cwd or WORKSPACE_DIR),
+        ["git", *auth_args, *args],
+        cwd=str(cwd or current_workspace()),
+        env={**os.environ, **auth_env} if auth_env else None,
         capture_output=True,
         text=True,
         check=True,
@@ -30,12 +147,552 @@ def _run_git(*args: str, cwd: Path | None = None) -> str:
     return result.stdout
 
 
-def _validate_path(rel_path: str) -> Path:
+@contextmanager
+def workspace_lease(workspace: Path = WORKSPACE_DIR) -> Iterator[None]:
+    """Hold an exclusive lock on `workspace` for the length of the block.
+
+    The lock is a flock on a file beside the workspace (so under
+    /mnt/workspace in AgentCore), which also keeps a hand-run script or a
+    second server process from running sync_workspace's reset --hard and
+    clean -fd underneath an invocation that's mid-edit. The wait is
+    stamped on the current span as workspace.lock.wait_ms.
+    """
+    workspace.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = workspace.parent / f".{workspace.name}.lock"
+    start = time.monotonic()
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        trace.get_current_span().set_attribute(
+            "workspace.lock.wait_ms", ms_since(start)
+        )
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class WorktreePool:
+    """Git worktrees of one shared bare mirror, leased one per invocation.
+
+    All worktrees use the mirror's object store, so handing one out is a
+    local reset --hard to the mirror's origin/main: no network, no
+    second copy of the history. Only sync_workspace talks to GitHub, and
+    its fetch lands in the mirror where every worktree sees it. A lease
+    reuses an idle worktree (a hit) or adds one up to `size` (a miss);
+    past that, callers wait for one to come back.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._idle: list[Path] = []
+        self._slots: set[Path] = set()
+        self._cond = threading.Condition()
+        self._mirror_lock = threading.Lock()
+        if WORKTREES_DIR.exists():
+            self._idle = sorted(
+                p for p in WORKTREES_DIR.iterdir() if (p / ".git").is_file()
+            )[:size]
+            self._slots = set(self._idle)
+
+    def ensure_mirror(self, fetch: bool = False) -> None:
+        """Create the bare mirror on first use; optionally fetch into it.
+        A mirror whose first fetch failed has no origin/main yet, so it
+        is fetched into regardless.
+
+        Remote branches land in refs/remotes/origin/* (not a --mirror
+        clone) so worktrees can push HEAD:main with an explicit refspec.
+        """
+        with self._mirror_lock, workspace_lease(MIRROR_DIR):
+            if not (MIRROR_DIR / "HEAD").exists():
+                _init_repo(MIRROR_DIR, bare=True)
+            elif fetch or not _ref_exists("refs/remotes/origin/main", MIRROR_DIR):
+                start = time.monotonic()
+                run_git("fetch", "--prune", "origin", cwd=MIRROR_DIR)
+                span = trace.get_current_span()
+                span.set_attribute("workspace.sync.method", "fetch")
+                span.set_attribute("workspace.sync.fetch_ms", ms_since(start))
+        _maybe_refresh_snapshot(MIRROR_DIR)
+
+    def _checkout(self) -> tuple[Path, bool]:
+        with self._cond:
+            while not self._idle and len(self._slots) >= self.size:
+                self._cond.wait()
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop(), True
+            self.misses += 1
+            n = 1
+            while WORKTREES_DIR / f"{WORKSPACE_DIR.name}-{n}" in self._slots:
+                n += 1
+            worktree = WORKTREES_DIR / f"{WORKSPACE_DIR.name}-{n}"
+            self._slots.add(worktree)
+            return worktree, False
+
+    def _checkin(self, worktree: Path) -> None:
+        with self._cond:
+            self._idle.append(worktree)
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self) -> Iterator[Path]:
+        self.ensure_mirror()
+        worktree, hit = self._checkout()
+        try:
+            with workspace_lease(worktree):
+                if not (worktree / ".git").exists():
+                    WORKTREES_DIR.mkdir(parents=True, exist_ok=True)
+                    run_git(
+                        "worktree", "add", "--detach", str(worktree), "origin/main",
+                        cwd=MIRROR_DIR,
+                    )
+                _reset_worktree(worktree)
+
+                span = trace.get_current_span()
+                span.set_attribute("workspace.path", str(worktree))
+                span.set_attribute("workspace.pool.hit", hit)
+                for name, value in self.stats().items():
+                    span.set_attribute(f"workspace.pool.{name}", value)
+
+                with using_workspace(worktree):
+                    yield worktree
+        finally:
+            self._checkin(worktree)
+
+    def stats(self) -> dict[str, int]:
+        with self._cond:
+            return {
+                "size": len(self._slots),
+                "idle": len(self._idle),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _s3_location(uri: str) -> tuple[str, str]:
+    if not uri.startswith("s3://") or "/" not in uri[5:]:
+        raise ValueError(f"CYNDIBOT_SNAPSHOT_S3_URI must be s3://bucket/key: {uri!r}")
+    bucket, key = uri[5:].split("/", 1)
+    return bucket, key
+
+
+def _local_snapshot() -> Path | None:
+    """The snapshot bundle on local disk, downloaded from S3 if it's only
+    there. None when there's no snapshot anywhere yet."""
+    if SNAPSHOT_PATH.exists():
+        return SNAPSHOT_PATH
+    if not SNAPSHOT_S3_URI:
+        return None
+    bucket, key = _s3_location(SNAPSHOT_S3_URI)
+    from botocore.exceptions import ClientError
+
+    s3 = s3_client()
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in {"404", "NoSuchKey"}:
+            return None
+        raise
+    SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    partial = SNAPSHOT_PATH.with_suffix(".partial")
+    s3.download_file(bucket, key, str(partial))
+    partial.replace(SNAPSHOT_PATH)
+    return SNAPSHOT_PATH
+
+
+def _init_repo(repo: Path, bare: bool) -> None:
+    """The equivalent of git clone, restoring from the snapshot when there
+    is one so the network fetch only covers commits since it was taken.
+
+    Stamps workspace.sync.method (restore or clone) and its timings on
+    the current span.
+    """
+    span = trace.get_current_span()
+    repo.mkdir(parents=True, exist_ok=True)
+    run_git("init", *(["--bare"] if bare else []), cwd=repo)
+    run_git("remote", "add", "origin", SITE_REPO_URL, cwd=repo)
+    run_git("config", "user.name", GIT_USER_NAME, cwd=repo)
+    run_git("config", "user.email", GIT_USER_EMAIL, cwd=repo)
+
+    start = time.monotonic()
+    bundle = _local_snapshot()
+    if bundle is not None:
+        run_git(
+            "fetch", str(bundle), "+refs/remotes/origin/*:refs/remotes/origin/*",
+            cwd=repo,
+        )
+        span.set_attribute("workspace.sync.restore_ms", ms_since(start))
+    fetch_start = time.monotonic()
+    run_git("fetch", "origin", cwd=repo)
+    span.set_attribute(
+        "workspace.sync.fetch_ms" if bundle is not None else "workspace.sync.clone_ms",
+        ms_since(fetch_start),
+    )
+    span.set_attribute("workspace.sync.method", "restore" if bundle is not None else "clone")
+    if not bare:
+        run_git("checkout", "-B", "main", "--track", "origin/main", cwd=repo)
+
+
+# Held while a bundle is written and uploaded. Every refresh writes the
+# same .partial path, so a direct call waits for a background one.
+_snapshot_writing = threading.Lock()
+
+
+def refresh_snapshot(repo: Path) -> dict[str, Any]:
+    """Bundle `repo`'s origin/main into SNAPSHOT_PATH (and S3, if set)."""
+    with _snapshot_writing:
+        SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        partial = SNAPSHOT_PATH.with_suffix(".partial")
+        run_git(
+            "bundle", "create", str(partial), "refs/remotes/origin/main", cwd=repo
+        )
+        partial.replace(SNAPSHOT_PATH)
+        if SNAPSHOT_S3_URI:
+            bucket, key = _s3_location(SNAPSHOT_S3_URI)
+            s3_client().upload_file(str(SNAPSHOT_PATH), bucket, key)
+        return {
+            "snapshot": str(SNAPSHOT_PATH),
+            "bytes": SNAPSHOT_PATH.stat().st_size,
+            "uploaded_to": SNAPSHOT_S3_URI or None,
+        }
+
+
+# Held while a background refresh is pending, so stale-snapshot checks
+# from concurrent syncs start one thread rather than one each.
+_snapshot_refreshing = threading.Lock()
+
+
+def _maybe_refresh_snapshot(repo: Path) -> None:
+    """Refresh a missing or stale snapshot off the request's critical path."""
+    if SNAPSHOT_PATH.exists() and (
+        time.time() - SNAPSHOT_PATH.stat().st_mtime < SNAPSHOT_MAX_AGE_SECONDS
+    ):
+        return
+    if not _snapshot_refreshing.acquire(blocking=False):
+        return
+
+    def refresh() -> None:
+        try:
+            refresh_snapshot(repo)
+        finally:
+            _snapshot_refreshing.release()
+
+    threading.Thread(target=refresh, name="snapshot-refresh", daemon=True).start()
+
+
+def _reset_worktree(worktree: Path) -> None:
+    run_git("reset", "--hard", sync_target(worktree), cwd=worktree)
+    run_git("clean", "-fd", cwd=worktree)
+
+
+worktree_pool = WorktreePool(WORKTREE_POOL_SIZE) if WORKTREE_POOL_SIZE else None
+
+
+class PublishConflict(RuntimeError):
+    """A rebase onto origin/main stopped on conflicting edits. The rebase
+    has been aborted; `files` are the paths both sides changed."""
+
+    def __init__(self, onto: str, files: list[str]):
+        super().__init__(f"rebase onto {onto} conflicts in: {', '.join(files)}")
+        self.onto = onto
+        self.files = files
+
+
+# Markers in git push's stderr for "the remote has commits you don't".
+_PUSH_REJECTED_MARKERS = ("[rejected]", "non-fast-forward", "fetch first")
+
+
+def _ref_exists(ref: str, cwd: Path) -> bool:
+    return (
+        subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", ref],
+            cwd=str(cwd),
+            capture_output=True,
+        ).returncode
+        == 0
+    )
+
+
+def sync_target(cwd: Path) -> str:
+    """What a fresh workspace resets to: the queued-but-unpushed commits
+    when there are any, so the next email builds on them."""
+    if PUBLISH_MODE == "deferred" and _ref_exists(PENDING_REF, cwd):
+        return PENDING_REF
+    return "origin/main"
+
+
+def _rebase_onto(onto: str, cwd: Path) -> None:
+    try:
+        run_git("rebase", onto, cwd=cwd)
+    except subprocess.CalledProcessError:
+        files = run_git("diff", "--name-only", "--diff-filter=U", cwd=cwd).split()
+        run_git("rebase", "--abort", cwd=cwd)
+        raise PublishConflict(onto, files) from None
+
+
+def _rebase_parking_conflicts(onto: str, cwd: Path) -> list[dict[str, Any]]:
+    """Rebase HEAD onto `onto`, skipping every commit that conflicts and
+    parking it on CONFLICTED_REF_PREFIX<sha>. Returns those commits'
+    sha, subject, conflicting files and ref."""
+    parked = []
+    try:
+        run_git("rebase", onto, cwd=cwd)
+        return parked
+    except subprocess.CalledProcessError:
+        pass
+    while True:
+        files = run_git("diff", "--name-only", "--diff-filter=U", cwd=cwd).split()
+        if not files:
+            run_git("rebase", "--abort", cwd=cwd)
+            raise RuntimeError(f"rebase onto {onto} stopped without a conflict")
+        sha = run_git("rev-parse", "REBASE_HEAD", cwd=cwd).strip()
+        ref = f"{CONFLICTED_REF_PREFIX}{sha}"
+        run_git("update-ref", ref, sha, cwd=cwd)
+        parked.append(
+            {
+                "commit": sha,
+                "subject": run_git("log", "-1", "--format=%s", sha, cwd=cwd).strip(),
+                "files": files,
+                "ref": ref,
+            }
+        )
+        try:
+            run_git("rebase", "--skip", cwd=cwd)
+            return parked
+        except subprocess.CalledProcessError:
+            continue
+
+
+def _push(remote_branch: str, cwd: Path | None = None, source: str = "HEAD") -> None:
+    """git push <source>:<remote_branch>. On an auth failure the secret is
+    re-read, and the push retried once if that yields a rotated token; a
+    static GITHUB_TOKEN or an unchanged secret raises with git's stderr."""
+    span = trace.get_current_span()
+    try:
+        run_git("push", "origin", f"{source}:{remote_branch}", cwd=cwd)
+        span.set_attribute("github.token.refreshed", False)
+    except subprocess.CalledProcessError as exc:
+        if not is_auth_failure(exc.stderr or ""):
+            raise
+        refreshed = github_token.refresh()
+        span.set_attribute("github.token.refreshed", refreshed)
+        if not refreshed:
+            raise
+        run_git("push", "origin", f"{source}:{remote_branch}", cwd=cwd)
+
+
+def _push_with_rebase(
+    cwd: Path, remote_branch: str = "main", attempts: int = PUSH_ATTEMPTS
+) -> None:
+    """Push HEAD; when origin has moved on, fetch, rebase onto it and push
+    again, up to `attempts` pushes. Raises PublishConflict if the rebase
+    hits conflicting edits. Stamps publish.attempts and publish.push_ms."""
+    span = trace.get_current_span()
+    start = time.monotonic()
+    try:
+        for attempt in range(1, attempts + 1):
+            span.set_attribute("publish.attempts", attempt)
+            try:
+                _push(remote_branch, cwd=cwd)
+                return
+            except subprocess.CalledProcessError as exc:
+                rejected = any(m in (exc.stderr or "") for m in _PUSH_REJECTED_MARKERS)
+                if not rejected or attempt == attempts:
+                    raise
+            run_git("fetch", "origin", cwd=cwd)
+            _rebase_onto(f"origin/{remote_branch}", cwd=cwd)
+    finally:
+        span.set_attribute("publish.push_ms", ms_since(start))
+
+
+def _publish_build(cwd: Path) -> dict[str, Any]:
+    """Build what was just pushed to main and force-push it to
+    DEPLOY_BRANCH. The branch only ever holds builds, so losing a build
+    commit to a concurrent publish costs nothing; the next one is built
+    from main again. Stamps build.* on the current span."""
+    start = time.monotonic()
+    tracking = f"origin/{DEPLOY_BRANCH}"
+    parent = tracking if _ref_exists(tracking, cwd) else None
+    build = build_commit(cwd, "HEAD", parent, BUILD_DIR)
+    if not build["up_to_date"]:
+        _push(f"refs/heads/{DEPLOY_BRANCH}", cwd=cwd, source=f"+{build['commit']}")
+        run_git("update-ref", f"refs/remotes/{tracking}", build["commit"], cwd=cwd)
+
+    span = trace.get_current_span()
+    span.set_attribute("build.files_rewritten", build["files_rewritten"])
+    span.set_attribute("build.outputs_computed", build["outputs_computed"])
+    span.set_attribute("build.bytes_before", build["bytes_before"])
+    span.set_attribute("build.bytes_after", build["bytes_after"])
+    span.set_attribute("build.ms", ms_since(start))
+    return {
+        "branch": DEPLOY_BRANCH,
+        "bytes_before": build["bytes_before"],
+        "bytes_after": build["bytes_after"],
+    }
+
+
+def _refs_repo() -> Path:
+    """The repository whose refs the workspaces share."""
+    return MIRROR_DIR if worktree_pool is not None else WORKSPACE_DIR
+
+
+class Publisher:
+    """Pushes the commits queued on PENDING_REF in deferred publish mode.
+
+    The first queued commit starts the window; when it closes, one push
+    publishes everything queued meanwhile. The push runs in a worktree of
+    its own, rebasing onto origin/main first when someone else pushed,
+    and PENDING_REF is deleted once it's live. A single lock covers both
+    queueing (which rebases the new commit onto PENDING_REF) and
+    publishing, so no queued commit is lost between the two.
+
+    A queued commit that conflicts with origin/main is parked on a ref of
+    its own (CONFLICTED_REF_PREFIX) and the rest are published without
+    it, so later syncs start from origin/main again; `failure` names the
+    parked commits and their files. Any other failed background publish
+    is retried after another window, up to PUBLISH_MAX_FAILURES in a row;
+    then `failure` says why, and only the next enqueue or flush() tries
+    again.
+    """
+
+    def __init__(self, window: float = PUBLISH_WINDOW_SECONDS):
+        self.window = window
+        self.failure: str | None = None
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._queued_at: float | None = None
+        self._depth = 0
+        self._failures = 0
+        self._thread: threading.Thread | None = None
+
+    def enqueue(self, workspace: Path) -> int:
+        """Queue `workspace`'s HEAD commit(s) and return the queue depth."""
+        with self._lock:
+            if _ref_exists(PENDING_REF, workspace):
+                _rebase_onto(PENDING_REF, cwd=workspace)
+            run_git("update-ref", PENDING_REF, "HEAD", cwd=workspace)
+        with self._cond:
+            self._depth += 1
+            if self._queued_at is None:
+                self._queued_at = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="site-publisher", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+            self._cond.notify()
+            return self._depth
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._queued_at is None:
+                    self._cond.wait()
+                due = self._queued_at + self.window - time.monotonic()
+                if due > 0:
+                    self._cond.wait(due)
+                    continue
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.exception("deferred publish failed")
+                with self._cond:
+                    self._failures += 1
+                    if self._failures < PUBLISH_MAX_FAILURES:
+                        self._queued_at = time.monotonic()
+                    else:
+                        self._queued_at = None
+                        self.failure = (
+                            f"queued changes failed to publish {self._failures} "
+                            f"times; last error: {type(exc).__name__}: {exc}"
+                        )
+
+    def flush(self) -> dict[str, Any]:
+        """Push whatever is queued now. Queued commits that conflict with
+        origin/main are taken out of the queue first and come back as
+        `conflicts`; everything else is pushed."""
+        tracer = trace.get_tracer("agent.site_tools")
+        with tracer.start_as_current_span("site.publish") as span, self._lock:
+            with self._cond:
+                depth = self._depth
+            span.set_attribute("publish.queue_depth", depth)
+            repo = _refs_repo()
+            if not _ref_exists(PENDING_REF, repo):
+                with self._cond:
+                    self._queued_at = None
+                    self._depth = 0
+                return {"pushed": False, "reason": "nothing queued"}
+
+            if not (PUBLISH_WORKTREE / ".git").exists():
+                run_git(
+                    "worktree", "add", "--detach", str(PUBLISH_WORKTREE), PENDING_REF,
+                    cwd=repo,
+                )
+            run_git("reset", "--hard", PENDING_REF, cwd=PUBLISH_WORKTREE)
+            run_git("fetch", "origin", cwd=PUBLISH_WORKTREE)
+            conflicts = _rebase_parking_conflicts("origin/main", cwd=PUBLISH_WORKTREE)
+            span.set_attribute("publish.conflict", bool(conflicts))
+            head = run_git("rev-parse", "HEAD", cwd=PUBLISH_WORKTREE).strip()
+            if conflicts:
+                span.set_attribute(
+                    "publish.conflict_files",
+                    sorted({f for c in conflicts for f in c["files"]}),
+                )
+                run_git("update-ref", PENDING_REF, head, cwd=repo)
+            result: dict[str, Any] = {"pushed": False, "commits_queued": depth}
+            if head != run_git("rev-parse", "origin/main", cwd=repo).strip():
+                _push_with_rebase(PUBLISH_WORKTREE)
+                result["pushed"] = True
+                if DEPLOY_BRANCH:
+                    # Before PENDING_REF goes, so a failed build is retried.
+                    result["build"] = _publish_build(PUBLISH_WORKTREE)
+            result["head"] = run_git("rev-parse", "HEAD", cwd=PUBLISH_WORKTREE).strip()
+            run_git("update-ref", "-d", PENDING_REF, cwd=repo)
+            with self._cond:
+                self._queued_at = None
+                self._depth = 0
+                self._failures = 0
+                self.failure = None
+                if conflicts:
+                    result["conflicts"] = conflicts
+                    self.failure = "queued changes conflict with the live site: " + (
+                        "; ".join(
+                            f"{c['subject']!r} in {', '.join(c['files'])}"
+                            f" (kept on {c['ref']})"
+                            for c in conflicts
+                        )
+                    )
+            return result
+
+
+publisher = Publisher() if PUBLISH_MODE == "deferred" else None
+
+
+def _publisher_for(workspace: Path) -> Publisher | None:
+    """The deferred publisher, if `workspace` can queue through it. Only
+    workspaces sharing _refs_repo()'s refs can: flush() never sees a
+    PENDING_REF written anywhere else (a replay clone's, say), so those
+    publish immediately instead."""
+    if publisher is None:
+        return None
+    refs_git_dir = MIRROR_DIR if worktree_pool is not None else WORKSPACE_DIR / ".git"
+    common_dir = run_git(
+        "rev-parse", "--path-format=absolute", "--git-common-dir", cwd=workspace
+    ).strip()
+    return publisher if Path(common_dir).resolve() == refs_git_dir.resolve() else None
+
+
+def validate_path(rel_path: str) -> Path:
+    """The absolute path of `rel_path` in the current workspace; raises
+    for absolute paths, anything outside the workspace and .git."""
+    workspace = current_workspace()
     if rel_path.startswith("/"):
         raise ValueError(f"path must be relative to workspace: {rel_path!r}")
-    resolved = (WORKSPACE_DIR / rel_path).resolve()
+    resolved = (workspace / rel_path).resolve()
     try:
-        rel = resolved.relative_to(WORKSPACE_DIR)
+        rel = resolved.relative_to(workspace)
     except ValueError as exc:
         raise ValueError(f"path escapes workspace: {rel_path!r}") from exc
     if rel.parts and rel.parts[0] == ".git":
@@ -44,86 +701,305 @@ def _validate_path(rel_path: str) -> Path:
 
 
 def sync_workspace_impl() -> dict[str, Any]:
-    if not (WORKSPACE_DIR / ".git").exists():
-        WORKSPACE_DIR.parent.mkdir(parents=True, exist_ok=True)
-        _run_git(
-            "clone",
-            SITE_REPO_URL,
-            str(WORKSPACE_DIR),
-            cwd=WORKSPACE_DIR.parent,
-        )
-        _run_git("config", "user.name", GIT_USER_NAME)
-        _run_git("config", "user.email", GIT_USER_EMAIL)
+    workspace = current_workspace()
+    if worktree_pool is not None and workspace.parent == WORKTREES_DIR:
+        worktree_pool.ensure_mirror(fetch=True)
+        _reset_worktree(workspace)
+    elif not (workspace / ".git").exists():
+        _init_repo(workspace, bare=False)
+        _maybe_refresh_snapshot(workspace)
     else:
-        _run_git("fetch", "origin")
-        _run_git("reset", "--hard", "origin/main")
-        _run_git("clean", "-fd")
+        start = time.monotonic()
+        run_git("fetch", "origin")
+        span = trace.get_current_span()
+        span.set_attribute("workspace.sync.method", "fetch")
+        span.set_attribute("workspace.sync.fetch_ms", ms_since(start))
+        run_git("reset", "--hard", sync_target(workspace))
+        run_git("clean", "-fd")
+        _maybe_refresh_snapshot(workspace)
 
     return {
-        "workspace": str(WORKSPACE_DIR),
-        "head": _run_git("rev-parse", "HEAD").strip(),
+        "workspace": str(workspace),
+        "head": run_git("rev-parse", "HEAD").strip(),
     }
 
 
 def list_site_files_impl() -> list[str]:
+    workspace = current_workspace()
     files = []
-    for p in WORKSPACE_DIR.rglob("*"):
-        if ".git" in p.parts:
+    for p in workspace.rglob("*"):
+        if ".git" in p.relative_to(workspace).parts:
             continue
         if p.is_file():
-            files.append(str(p.relative_to(WORKSPACE_DIR)))
+            files.append(str(p.relative_to(workspace)))
     return sorted(files)
 
 
+# Past this many matches, list_site_files answers with a directory tree
+# unless the caller asked for a page of paths.
+LIST_COMPACT_THRESHOLD = 150
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 500
+# JSON around the paths in a page: keys, total_files and next_cursor.
+_LIST_PAGE_OVERHEAD_BYTES = 100
+
+
+def _tree_summary(workspace: Path, files: list[str]) -> dict[str, Any]:
+    """Per-directory file counts and byte totals (each including its
+    subdirectories), plus the files sitting directly in the root."""
+    counts: dict[str, list[int]] = {}
+    root_files = []
+    total_bytes = 0
+    for rel_path in files:
+        size = (workspace / rel_path).stat().st_size
+        total_bytes += size
+        parts = rel_path.split("/")[:-1]
+        if not parts:
+            root_files.append(rel_path)
+        for depth in range(1, len(parts) + 1):
+            entry = counts.setdefault("/".join(parts[:depth]) + "/", [0, 0])
+            entry[0] += 1
+            entry[1] += size
+    tree = [
+        f"{'  ' * (d.count('/') - 1)}{d.rsplit('/', 2)[-2]}/ "
+        f"({n} files, {b / 1024:.0f} KB)"
+        for d, (n, b) in sorted(counts.items())
+    ]
+    return {
+        "total_files": len(files),
+        "total_bytes": total_bytes,
+        "root_files": root_files,
+        "tree": tree,
+    }
+
+
+def list_site_files_view_impl(
+    glob: str | None = None,
+    under: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    summary: bool | None = None,
+    max_bytes: int | None = None,
+) -> dict[str, Any]:
+    """A bounded view of the workspace's files: a page of paths, or a
+    directory tree with counts when there are too many to list. With
+    max_bytes, a page also ends early enough to fit, and next_cursor
+    continues from the last path actually returned."""
+    workspace = current_workspace()
+    files = list_site_files_impl()
+    if under:
+        # "." and "./" are the root itself: Path(".").parts is empty.
+        directory = validate_path(under).relative_to(workspace)
+        if directory.parts:
+            files = [f for f in files if f.startswith(f"{directory}/")]
+    if glob:
+        files = [f for f in files if fnmatch.fnmatch(f, glob)]
+
+    if summary is None:
+        summary = (
+            len(files) > LIST_COMPACT_THRESHOLD and limit is None and cursor is None
+        )
+    span = trace.get_current_span()
+    span.set_attribute("list_site_files.matches", len(files))
+    span.set_attribute("list_site_files.summary", summary)
+    if summary:
+        return {
+            **_tree_summary(workspace, files),
+            "hint": "Pass under=, glob= or limit= to list paths.",
+        }
+
+    offset = int(cursor) if cursor else 0
+    if offset < 0 or offset > len(files):
+        raise ValueError(f"cursor {cursor!r} out of range (0..{len(files)})")
+    limit = min(limit or LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT)
+    page = []
+    used = _LIST_PAGE_OVERHEAD_BYTES
+    for path in files[offset : offset + limit]:
+        used += len(json.dumps(path, ensure_ascii=False).encode("utf-8")) + 2
+        if page and max_bytes is not None and used > max_bytes:
+            break
+        page.append(path)
+    end = offset + len(page)
+    return {
+        "files": page,
+        "total_files": len(files),
+        "next_cursor": str(end) if end < len(files) else None,
+    }
+
+
+# Enough to tell text from binary without reading a whole photo.
+_BINARY_SNIFF_BYTES = 8192
+
+
 def read_site_file_impl(path: str) -> str:
-    return _validate_path(path).read_text()
+    target = validate_path(path)
+    with open(target, "rb") as f:
+        is_binary = b"\0" in f.read(_BINARY_SNIFF_BYTES)
+    if not is_binary:
+        try:
+            return target.read_text(encoding="utf-8")
+        except UnicodeDecodeError:
+            pass
+    raise ValueError(f"{path!r} is a binary file; use image_info for images")
 
 
 def write_site_file_impl(path: str, content: str) -> dict[str, Any]:
-    target = _validate_path(path)
+    target = validate_path(path)
     target.parent.mkdir(parents=True, exist_ok=True)
     target.write_text(content)
     return {
-        "path": str(target.relative_to(WORKSPACE_DIR)),
+        "path": str(target.relative_to(current_workspace())),
         "bytes": len(content.encode("utf-8")),
     }
 
 
 def delete_site_file_impl(path: str) -> dict[str, Any]:
-    target = _validate_path(path)
+    target = validate_path(path)
     if not target.exists():
         raise FileNotFoundError(f"no such file in workspace: {path!r}")
     if target.is_dir():
         raise IsADirectoryError(f"refusing to delete directory: {path!r}")
     target.unlink()
-    return {"deleted": str(target.relative_to(WORKSPACE_DIR))}
+    return {"deleted": str(target.relative_to(current_workspace()))}
+
+
+def _prune_orphan_images() -> list[str]:
+    """Delete and unstage files newly added under images/ that no HTML or
+    CSS file in the workspace references -- attachments the email brought
+    in that didn't end up on a page. Runs on a staged tree that has passed
+    validation, so a mistyped reference is reported before the image it
+    meant could be taken for an orphan. Returns the deleted paths."""
+    workspace = current_workspace()
+    new_images = run_git(
+        "diff", "--cached", "--name-only", "--diff-filter=A", "-z", "--", "images/"
+    ).split("\0")
+    new_images = [p for p in new_images if p]
+    if not new_images:
+        return []
+    referenced = referenced_paths(workspace, list_site_files_impl())
+    pruned = sorted(p for p in new_images if p not in referenced)
+    for rel_path in pruned:
+        (workspace / rel_path).unlink()
+    if pruned:
+        run_git("add", "-A", "--", *pruned)
+
+    span = trace.get_current_span()
+    span.set_attribute("commit.new_images", len(new_images))
+    span.set_attribute("commit.pruned_images", pruned)
+    return pruned
 
 
 def commit_site_changes_impl(message: str) -> dict[str, Any]:
-    _run_git("add", "-A")
-    status = _run_git("status", "--porcelain").strip()
+    run_git("add", "-A")
+    if not run_git("status", "--porcelain").strip():
+        return {"committed": False, "reason": "no changes staged", "pruned": []}
+    start = time.monotonic()
+    validation = validate_staged(current_workspace(), PAGE_CHECK_DIR)
+    span = trace.get_current_span()
+    span.set_attribute("validate.files", validation["checked"])
+    span.set_attribute("validate.parsed", validation["parsed"])
+    span.set_attribute("validate.problems", len(validation["problems"]))
+    span.set_attribute("validate.ms", ms_since(start))
+    if validation["problems"]:
+        return {
+            "committed": False,
+            "reason": "fix these problems, then publish again",
+            "problems": validation["problems"],
+            "pruned": [],
+        }
+    pruned = _prune_orphan_images()
+    status = run_git("status", "--porcelain").strip()
     if not status:
-        return {"committed": False, "reason": "no changes staged"}
-    _run_git("commit", "-m", message)
-    return {
+        return {"committed": False, "reason": "no changes staged", "pruned": pruned}
+    run_git("commit", "-m", message)
+    result = {
         "committed": True,
-        "head": _run_git("rev-parse", "HEAD").strip(),
+        "head": run_git("rev-parse", "HEAD").strip(),
         "files_changed": status,
+        "pruned": pruned,
     }
+    queue = _publisher_for(current_workspace())
+    if queue is not None and not is_dry_run():
+        depth = queue.enqueue(current_workspace())
+        span.set_attribute("publish.queue_depth", depth)
+        result["head"] = run_git("rev-parse", "HEAD").strip()
+        result["publish_queued"] = True
+    return result
 
 
-def push_site_changes_impl(remote_branch: str = "main") -> dict[str, Any]:
+def push_site_changes_impl(
+    remote_branch: str = "main", now: bool = False
+) -> dict[str, Any]:
     """Push HEAD to origin/<remote_branch>. Defaults to main.
 
-    Relies on the local git credential helper for auth; no token
-    plumbing here. On auth failure, git exits non-zero and subprocess
-    raises -- the caller sees the original git stderr.
+    Auth comes from agent.github_token. In deferred publish mode the
+    commit is already queued, so this only reports when it will go out,
+    unless `now` asks for the queue to be pushed immediately. Either way
+    a publish that gave up or parked conflicting commits is reported as
+    publish_failed.
     """
-    _run_git("push", "origin", f"HEAD:{remote_branch}")
+    queue = _publisher_for(current_workspace()) if remote_branch == "main" else None
+    if queue is not None:
+        failure = queue.failure
+        trace.get_current_span().set_attribute("publish.failed_earlier", bool(failure))
+        if now:
+            result = queue.flush()
+        else:
+            result = {
+                "pushed": False,
+                "queued": True,
+                "publishes_within_seconds": queue.window,
+            }
+        if queue.failure and (failure or now):
+            result["publish_failed"] = queue.failure
+        return result
+    _push(remote_branch)
     return {
         "pushed": True,
         "remote_branch": remote_branch,
-        "head": _run_git("rev-parse", "HEAD").strip(),
+        "head": run_git("rev-parse", "HEAD").strip(),
+    }
+
+
+def publish_site_changes_impl(message: str, now: bool = False) -> dict[str, Any]:
+    """Commit, then push to main, rebasing onto whatever landed on origin
+    meanwhile. Only a rebase that stops on conflicting edits comes back
+    to the caller, as conflict=True with the files involved; a commit
+    that can't be queued in deferred mode is reported the same way. In
+    deferred mode `now` pushes the queue at once instead of at the end
+    of the window.
+    """
+    span = trace.get_current_span()
+    span.set_attribute("publish.conflict", False)
+    try:
+        result = commit_site_changes_impl(message)
+        if not result["committed"]:
+            return result
+        if is_dry_run():
+            span.set_attribute("publish.dry_run", True)
+            return {**result, "pushed": False, "dry_run": True}
+        if _publisher_for(current_workspace()) is not None:
+            pushed = push_site_changes_impl("main", now=now)
+            for parked in pushed.get("conflicts", []):
+                if parked["commit"] == result["head"]:
+                    raise PublishConflict("origin/main", parked["files"])
+            return {**result, **pushed}
+        _push_with_rebase(current_workspace())
+        if DEPLOY_BRANCH:
+            result["build"] = _publish_build(current_workspace())
+    except PublishConflict as exc:
+        span.set_attribute("publish.conflict", True)
+        span.set_attribute("publish.conflict_files", exc.files)
+        return {
+            "committed": True,
+            "pushed": False,
+            "conflict": True,
+            "conflicting_files": exc.files,
+        }
+    return {
+        **result,
+        "pushed": True,
+        "head": run_git("rev-parse", "HEAD").strip(),
     }
 
 
@@ -133,15 +1009,61 @@ def sync_workspace() -> dict[str, Any]:
 
     Always call this first, before reading or editing any files. It
     discards any prior local changes and returns the current HEAD sha.
+    When the site changed since the digest in the first message (or
+    there was none), the result includes site_digest for what's there
+    now; use it instead.
     """
-    return sync_workspace_impl()
+    # site_digest imports this module.
+    from agent.site_digest import refreshed_digest
+
+    result = sync_workspace_impl()
+    digest = refreshed_digest(current_workspace())
+    if digest is not None:
+        result["site_digest"] = digest
+    return result
 
 
 @tool
-def list_site_files() -> list[str]:
-    """List every tracked and untracked file in the site workspace,
-    relative to the workspace root. Excludes .git."""
-    return list_site_files_impl()
+def list_site_files(
+    glob: str | None = None,
+    under: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    summary: bool | None = None,
+) -> dict[str, Any]:
+    """List files in the site workspace (tracked and untracked, relative to
+    the workspace root, excluding .git).
+
+    With many matches and no limit/cursor, returns a directory tree with
+    file counts and sizes instead of every path; narrow it down with
+    under or glob, or page through with limit and cursor.
+
+    Args:
+        glob: Shell-style pattern on the whole path, e.g. "*.html" or
+            "images/*.jpg" (* also matches across "/").
+        under: Only files inside this directory, e.g. "images".
+        limit: Paths per page (default 100, max 500). A page can come back
+            shorter to fit the result size limit; keep following
+            next_cursor.
+        cursor: next_cursor from the previous page.
+        summary: True for the tree view, False for paths; by default the
+            tree is used only when there are too many paths to list.
+
+    Returns:
+        Either {files, total_files, next_cursor} or {total_files,
+        total_bytes, root_files, tree}.
+    """
+    return shape_result(
+        "list_site_files",
+        list_site_files_view_impl(
+            glob,
+            under,
+            limit,
+            cursor,
+            summary,
+            max_bytes=result_allowance("list_site_files"),
+        ),
+    )
 
 
 @tool
@@ -152,8 +1074,11 @@ def read_site_file(path: str) -> str:
         path: Path relative to the workspace root (e.g. "index.html",
             "css/styles.css"). Absolute paths and anything under .git
             are rejected.
+
+    Large files are cut short; the text then ends with a note giving a
+    handle for read_tool_result.
     """
-    return read_site_file_impl(path)
+    return shape_result("read_site_file", read_site_file_impl(path))
 
 
 @tool
@@ -174,8 +1099,9 @@ def write_site_file(path: str, content: str) -> dict[str, Any]:
 def delete_site_file(path: str) -> dict[str, Any]:
     """Delete a single file from the site workspace.
 
-    Use this to drop attachments parse_inbound wrote into images/ that
-    you don't want to keep, before commit_site_changes runs git add -A.
+    Attachments parse_inbound wrote into images/ that no page
+    references are dropped automatically at commit time, so there's no
+    need to delete those one by one.
 
     Args:
         path: Path relative to the workspace root. Absolute paths and
@@ -186,28 +1112,33 @@ def delete_site_file(path: str) -> dict[str, Any]:
 
 
 @tool
-def commit_site_changes(message: str) -> dict[str, Any]:
-    """Stage all changes in the workspace and create a git commit.
+def publish_site_changes(message: str, publish_now: bool = False) -> dict[str, Any]:
+    """Commit every change in the workspace and publish it to the live
+    site (GitHub Pages redeploys within a minute or so).
+
+    If someone else changed the site since sync_workspace, your commit is
+    rebased onto theirs and pushed again automatically. Only when you
+    both edited the same lines does this give up with conflict=True and
+    conflicting_files: then call sync_workspace, re-read those files,
+    redo your edit on top of theirs, and call this again.
 
-    Does NOT push. Use for local edits; a separate push step is needed
-    to publish to the live site.
+    Changed pages are checked first. If any has unbalanced tags or points
+    at a file that doesn't exist, nothing is committed and problems lists
+    each one ({file, line, problem, ref}); fix them and call this again.
 
     Args:
         message: Commit message. Should briefly describe what changed
             and why, in human terms.
+        publish_now: Push immediately even when publishing is batched.
+            Only when mom asks for the change to be live right away.
 
     Returns:
-        Dict with committed (bool), head sha (if committed), and a
-        porcelain-format files_changed summary.
+        Dict with committed, pushed, head, a porcelain-format
+        files_changed summary, and pruned (new images/ files no page
+        referenced, deleted instead of committed). With queued=True the
+        change goes live within publishes_within_seconds instead of
+        right away. publish_failed means earlier queued changes still
+        aren't live after several tries; mention it in the reply.
     """
-    return commit_site_changes_impl(message)
+    return publish_site_changes_impl(message, now=publish_now)
 
-
-@tool
-def push_site_changes() -> dict[str, Any]:
-    """Push the local main branch to origin/main. The live site at
-    cynditaylor.com will redeploy via GitHub Pages within a minute or so.
-
-    Only call this after commit_site_changes reports committed=True.
-    """
-    return push_site_changes_impl("main")
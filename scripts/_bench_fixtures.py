@@ -0,0 +1,184 @@
+"""Synthetic inputs for the offline benchmarks: photos, emails and sites.
+
+Everything is generated from a seed, so two runs on the same commit see
+byte-identical inputs. Photos are noise over a gradient rather than flat
+colour, so encoders and decoders do realistic amounts of work.
+"""
+
+import random
+import subprocess
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+from io import BytesIO
+from pathlib import Path
+
+from agent.tools.images import pil_image
+
+SENDER = "Cyndi <cyndi@example.com>"
+RECIPIENT = "bot@cyndibot.jessitron.honeydemo.io"
+FIRST_DATE = datetime(2026, 3, 2, 9, 30, tzinfo=timezone.utc)
+# Bump when photo() changes, so cached photos are regenerated.
+FIXTURE_VERSION = 1
+
+_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "png": ("PNG", "image/png", ".png"),
+    "heic": ("HEIF", "image/heic", ".heic"),
+}
+_WORDS = (
+    "garden roses painted fence spring light studio canvas morning blue "
+    "window shelf clay bowl market friends sunday kiln glaze"
+).split()
+
+
+def photo(fmt: str, megapixels: float, seed: int = 0) -> bytes:
+    """A 4:3 photo of about `megapixels` MP in `fmt` (jpeg, png, heic)."""
+    Image = pil_image()
+    pil_format, _, _ = _FORMATS[fmt]
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    noise = Image.effect_noise((width, height), 48 + seed % 16)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (noise, gradient, gradient.rotate(90 + seed)))
+    out = BytesIO()
+    img.save(out, format=pil_format, **({"quality": 90} if fmt != "png" else {}))
+    return out.getvalue()
+
+
+def cached_photo(fmt: str, megapixels: float, cache_dir: Path, seed: int = 0) -> bytes:
+    """photo(), kept in cache_dir: a 48 MP HEIC takes a while to encode."""
+    path = cache_dir / f"v{FIXTURE_VERSION}-{fmt}-{megapixels:g}mp-{seed}"
+    if path.exists():
+        return path.read_bytes()
+    data = photo(fmt, megapixels, seed)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    partial.write_bytes(data)
+    partial.replace(path)
+    return data
+
+
+def attachment(fmt: str, data: bytes, name: str) -> tuple[str, str, bytes]:
+    _, content_type, suffix = _FORMATS[fmt]
+    return f"{name}{suffix}", content_type, data
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def quoted_thread(depth: int, seed: int = 0) -> str:
+    """`depth` earlier messages, each quoted one level deeper, as mail
+    clients build them up when everyone hits reply."""
+    rng = random.Random(seed)
+    thread = ""
+    for n in range(depth):
+        when = format_datetime(FIRST_DATE - timedelta(days=depth - n))
+        body = "\n".join(_sentence(rng) for _ in range(6))
+        if thread:
+            quoted = "\n".join(f"> {line}" for line in thread.splitlines())
+            body = f"{body}\n\nOn {when}, {SENDER} wrote:\n{quoted}"
+        thread = body
+    return thread
+
+
+def email_bytes(
+    subject: str,
+    body: str,
+    attachments: list[tuple[str, str, bytes]] = (),
+    quoted_depth: int = 0,
+    seed: int = 0,
+) -> bytes:
+    msg = EmailMessage()
+    msg["From"] = SENDER
+    msg["To"] = RECIPIENT
+    msg["Subject"] = subject
+    msg["Date"] = format_datetime(FIRST_DATE + timedelta(hours=seed))
+    msg["Message-ID"] = f"<bench-{seed}@example.com>"
+    if quoted_depth:
+        msg["In-Reply-To"] = f"<bench-{seed}-prev@example.com>"
+        when = format_datetime(FIRST_DATE)
+        quoted = "\n".join(
+            f"> {line}" for line in quoted_thread(quoted_depth, seed).splitlines()
+        )
+        body = f"{body}\n\nOn {when}, Cyndibot <{RECIPIENT}> wrote:\n{quoted}"
+    msg.set_content(f"{body}\n\n--\nSent from my iPhone\n")
+    for filename, content_type, data in attachments:
+        maintype, subtype = content_type.split("/")
+        msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+    return bytes(msg)
+
+
+_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>{title}</title>
+  <link rel="stylesheet" href="css/style.css">
+</head>
+<body>
+  <header><h1>Cyndi Taylor</h1></header>
+  <nav><a href="index.html">Home</a> <a href="gallery.html">Gallery</a></nav>
+  <main>
+{main}
+  </main>
+  <footer>&copy; Cyndi Taylor</footer>
+</body>
+</html>
+"""
+_FIGURE = (
+    '    <figure class="item"><img src="images/{name}" alt="{alt}">'
+    "<figcaption>{alt}</figcaption></figure>"
+)
+
+
+def _git(cwd: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=str(cwd), check=True, capture_output=True)
+
+
+def site_remote(root: Path, pages: int, images: int, image_bytes: int = 8192) -> Path:
+    """A bare repo at root/remote.git holding a site with `pages` HTML
+    pages (index.html and gallery.html among them) and `images` images,
+    all shown in the gallery."""
+    rng = random.Random(pages * 100_003 + images)
+    site = root / "site-src"
+    (site / "css").mkdir(parents=True)
+    (site / "images").mkdir()
+    (site / "css" / "style.css").write_text(
+        "body { font-family: Georgia, serif; margin: 0 auto; max-width: 60em; }\n"
+        ".gallery { display: grid; grid-template-columns: repeat(3, 1fr); }\n"
+    )
+    names = []
+    for n in range(images):
+        name = f"{2020 + n % 6}/photo-{n:05d}.jpg"
+        (site / "images" / name).parent.mkdir(exist_ok=True)
+        (site / "images" / name).write_bytes(rng.randbytes(image_bytes))
+        names.append(name)
+
+    welcome = f"    <p class=\"welcome\">{_sentence(rng, 20)}</p>"
+    (site / "index.html").write_text(_PAGE.format(title="Home", main=welcome))
+    figures = "\n".join(
+        _FIGURE.format(name=name, alt=_sentence(rng, 3)[:-1]) for name in names
+    )
+    (site / "gallery.html").write_text(
+        _PAGE.format(
+            title="Gallery", main=f'    <div class="gallery">\n{figures}\n    </div>'
+        )
+    )
+    for n in range(max(0, pages - 2)):
+        text = "\n".join(f"    <p>{_sentence(rng, 40)}</p>" for _ in range(8))
+        (site / f"page-{n:04d}.html").write_text(
+            _PAGE.format(title=f"Page {n}", main=text)
+        )
+
+    _git(site, "init", "-q", "-b", "main")
+    _git(site, "add", "-A")
+    _git(
+        site,
+        "-c", "user.name=Bench", "-c", "user.email=bench@example.com",
+        "commit", "-q", "-m", "Synthetic site",
+    )
+    remote = root / "remote.git"
+    _git(root, "clone", "-q", "--bare", str(site), str(remote))
+    return remote
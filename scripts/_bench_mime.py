@@ -0,0 +1,314 @@
+"""Microbenchmarks for inbound MIME parsing and image conversion.
+
+Synthetic emails (scripts/_bench_fixtures.py) go through the CPU- and
+memory-heavy parts of email_tools, one operation at a time:
+
+    parse    parse_inbound_impl end to end: read, MIME parse, body digest,
+             every attachment decoded and written (HEIC converted)
+    mime     MIME parse, body digest and base64 decode only; nothing written
+    write    _write_image_attachment for every image part
+    convert  _convert_heic_to_jpg for every HEIC payload (HEIC cases only)
+
+A case is named by what's in the email:
+
+    {jpeg|heic|png|mixed}-{MP}mp-x{N}[-q{DEPTH}]   N photos of MP megapixels
+    text[-q{DEPTH}]                                no attachments
+
+-q adds a quoted thread DEPTH replies long; mixed cycles jpeg, heic, png.
+
+    python scripts/_bench_mime.py [--case NAME ...] [--full] [--repeat N]
+        [--json OUT] [--compare OLD.json] [--fixtures DIR]
+
+Each (case, operation) runs in a fresh interpreter, so its peak RSS is
+its own. Wall and CPU times are medians over --repeat runs; CPU counts
+every thread, so it can exceed wall when libheif decodes in parallel.
+base_rss_mb is the peak once the inputs are loaded and Pillow imported,
+before the first timed run. --json writes results with the commit they
+were taken at; --compare diffs this run against such a file.
+"""
+
+import argparse
+import email
+import json
+import platform
+import re
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from email import policy
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+OPERATIONS = ("parse", "mime", "write", "convert")
+DEFAULT_REPEAT = 3
+DEFAULT_FIXTURES = Path(tempfile.gettempdir()) / "cyndibot-bench-fixtures"
+DEFAULT_CASES = (
+    "text-q10",
+    "text-q200",
+    "jpeg-1mp-x1",
+    "jpeg-12mp-x1",
+    "jpeg-1mp-x20",
+    "png-12mp-x1",
+    "heic-1mp-x1",
+    "heic-12mp-x1",
+    "heic-1mp-x20",
+    "mixed-12mp-x6-q50",
+)
+FULL_CASES = (
+    "jpeg-48mp-x1",
+    "png-48mp-x1",
+    "heic-48mp-x1",
+    "heic-12mp-x20",
+)
+
+_CASE_RE = re.compile(
+    r"(?:(?P<fmt>jpeg|heic|png|mixed)-(?P<mp>\d+(?:\.\d+)?)mp-x(?P<count>\d+)"
+    r"|text)(?:-q(?P<depth>\d+))?"
+)
+_MIXED = ("jpeg", "heic", "png")
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    formats: tuple[str, ...]
+    megapixels: float
+    quoted_depth: int
+
+    @classmethod
+    def parse(cls, name: str) -> "Case":
+        m = _CASE_RE.fullmatch(name)
+        if m is None:
+            raise ValueError(
+                f"bad case {name!r}: want FMT-MPmp-xN[-qDEPTH] or text[-qDEPTH]"
+            )
+        depth = int(m["depth"] or 0)
+        if m["fmt"] is None:
+            return cls(name, (), 0.0, depth)
+        count = int(m["count"])
+        if count < 1:
+            raise ValueError(f"bad case {name!r}: needs at least one photo")
+        cycle = _MIXED if m["fmt"] == "mixed" else (m["fmt"],)
+        formats = tuple(cycle[n % len(cycle)] for n in range(count))
+        return cls(name, formats, float(m["mp"]), depth)
+
+    def operations(self) -> tuple[str, ...]:
+        if not self.formats:
+            return ("parse", "mime")
+        if "heic" in self.formats:
+            return OPERATIONS
+        return ("parse", "mime", "write")
+
+
+def build_email(case: Case, fixtures: Path) -> bytes:
+    from _bench_fixtures import attachment, cached_photo, email_bytes
+
+    files = [
+        attachment(fmt, cached_photo(fmt, case.megapixels, fixtures), f"photo-{n}")
+        for n, fmt in enumerate(case.formats)
+    ]
+    return email_bytes(
+        f"Bench {case.name}",
+        "Please put these on the website!",
+        files,
+        quoted_depth=case.quoted_depth,
+    )
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_operation(key: str, operation: str, repeat: int) -> dict:
+    """Run in the child interpreter: time `operation` on the email at
+    `key` in the inbound directory."""
+    from agent.inbound_source import inbound_source
+    from agent.tools.email_tools import (
+        _convert_heic_to_jpg,
+        _digest_body,
+        _is_heic,
+        _write_image_attachment,
+        parse_inbound_impl,
+    )
+    from agent.tools.images import pil_image
+    from agent.tools.site_tools import WORKSPACE_DIR, using_workspace
+
+    images_dir = WORKSPACE_DIR / "images"
+    raw = inbound_source().read(key)
+    msg = email.message_from_bytes(raw, policy=policy.default)
+    parts = [
+        part
+        for part in msg.iter_attachments()
+        if part.get_content_type().startswith("image/")
+    ]
+    heics = [
+        (part.get_payload(decode=True), part.get_filename())
+        for part in parts
+        if _is_heic(part.get_content_type(), part.get_filename() or "")
+    ]
+    if parts:
+        pil_image()
+
+    def parse() -> None:
+        parse_inbound_impl(key)
+
+    def mime() -> None:
+        parsed = email.message_from_bytes(raw, policy=policy.default)
+        _digest_body(parsed)
+        for part in parsed.iter_attachments():
+            part.get_payload(decode=True)
+
+    def write() -> None:
+        for part in parts:
+            _write_image_attachment(part, images_dir)
+
+    def convert() -> None:
+        for n, (payload, filename) in enumerate(heics):
+            _convert_heic_to_jpg(payload, images_dir / f"convert-{n}.jpg", filename)
+
+    run = {"parse": parse, "mime": mime, "write": write, "convert": convert}[
+        operation
+    ]
+    base_rss = _peak_rss_mb()
+    walls, cpus = [], []
+    with using_workspace(WORKSPACE_DIR):
+        for _ in range(repeat):
+            shutil.rmtree(images_dir, ignore_errors=True)
+            images_dir.mkdir(parents=True)
+            wall, cpu = time.perf_counter(), time.process_time()
+            run()
+            walls.append((time.perf_counter() - wall) * 1000)
+            cpus.append((time.process_time() - cpu) * 1000)
+    return {
+        "wall_ms": round(statistics.median(walls), 1),
+        "wall_ms_min": round(min(walls), 1),
+        "cpu_ms": round(statistics.median(cpus), 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "base_rss_mb": round(base_rss, 1),
+    }
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(
+        ["git", *args],
+        cwd=str(SCRIPTS_DIR.parent),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+
+def _environment(repeat: int) -> dict:
+    from importlib.metadata import version
+
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "pillow": version("pillow"),
+        "pillow_heif": version("pillow-heif"),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "repeat": repeat,
+    }
+
+
+def _change(new: float, old: float | None) -> str:
+    if not old:
+        return ""
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def print_table(cases: dict, previous: dict | None) -> None:
+    header = (
+        f"{'case':<20} {'op':<8} {'MB in':>7} {'wall ms':>9} {'cpu ms':>9} "
+        f"{'peak MB':>8}"
+    )
+    if previous:
+        header += f" {'wall Δ':>7} {'peak Δ':>7}"
+    print(header)
+    for name, case in cases.items():
+        for op, r in case["operations"].items():
+            line = (
+                f"{name:<20} {op:<8} {case['email_bytes'] / 1e6:>7.1f} "
+                f"{r['wall_ms']:>9.1f} {r['cpu_ms']:>9.1f} {r['peak_rss_mb']:>8.0f}"
+            )
+            if previous:
+                old = previous.get(name, {}).get("operations", {}).get(op, {})
+                line += (
+                    f" {_change(r['wall_ms'], old.get('wall_ms')):>7}"
+                    f" {_change(r['peak_rss_mb'], old.get('peak_rss_mb')):>7}"
+                )
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", action="append", help="case name (repeatable)")
+    parser.add_argument("--full", action="store_true", help="add the 48 MP cases")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--compare", help="results JSON from an earlier run")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        key, operation = args.child
+        print(json.dumps(run_operation(key, operation, args.repeat)))
+        return
+
+    names = args.case or [*DEFAULT_CASES, *(FULL_CASES if args.full else ())]
+    try:
+        cases = [Case.parse(name) for name in names]
+    except ValueError as exc:
+        parser.error(str(exc))
+    previous = None
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text())["cases"]
+
+    sys.path.insert(0, str(SCRIPTS_DIR.parent))
+    from _bench_pipeline import child_env
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-mime-") as tmp:
+        root = Path(tmp)
+        (root / "inbound").mkdir()
+        (root / "ws").mkdir()
+        env = child_env(root)
+        for case in cases:
+            print(f"preparing {case.name}...", file=sys.stderr)
+            raw = build_email(case, args.fixtures)
+            key = f"{case.name}.eml"
+            (root / "inbound" / key).write_bytes(raw)
+            operations = {}
+            for op in case.operations():
+                print(f"  {op}...", file=sys.stderr)
+                command = [sys.executable, __file__, "--child", key, op]
+                command += ["--repeat", str(args.repeat)]
+                child = subprocess.run(command, env=env, capture_output=True, text=True)
+                if child.returncode != 0:
+                    raise SystemExit(
+                        f"{case.name} {op} failed:\n{child.stderr[-4000:]}"
+                    )
+                operations[op] = json.loads(child.stdout.splitlines()[-1])
+            results[case.name] = {
+                **{k: v for k, v in asdict(case).items() if k != "name"},
+                "email_bytes": len(raw),
+                "operations": operations,
+            }
+
+    print_table(results, previous)
+    if args.json:
+        report = {"environment": _environment(args.repeat), "cases": results}
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
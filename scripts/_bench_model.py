@@ -0,0 +1,72 @@
+"""A deterministic stand-in for Bedrock, for the offline benchmarks.
+
+It plays back a script: one entry per model turn, either a list of tool
+calls ({"name": ..., "input": {...}}) or the final text. That's the
+shape of a run as it appears in a trace (the execute_tool spans, in
+order), so a real run's tool-call sequence can be saved as JSON and
+replayed with load_script(). Token usage is reported as zero: the point
+is to time our tools, not the model.
+"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from strands.models.model import Model
+
+Turn = str | list[dict[str, Any]]
+
+
+class ScriptedModel(Model):
+    def __init__(self, script: list[Turn]):
+        self.script = list(script)
+        self.turns = 0
+
+    def update_config(self, **model_config: Any) -> None:
+        pass
+
+    def get_config(self) -> dict[str, Any]:
+        return {}
+
+    async def structured_output(self, *args: Any, **kwargs: Any):
+        raise NotImplementedError("the scripted model only plays tool calls")
+        yield
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        if self.turns == len(self.script):
+            raise RuntimeError(f"script ran out after {self.turns} turns")
+        turn = self.script[self.turns]
+        self.turns += 1
+        for event in _events(turn, self.turns):
+            yield event
+
+
+def _events(turn: Turn, n: int) -> list[dict[str, Any]]:
+    events: list[dict[str, Any]] = [{"messageStart": {"role": "assistant"}}]
+    if isinstance(turn, str):
+        events += [
+            {"contentBlockStart": {"start": {}}},
+            {"contentBlockDelta": {"delta": {"text": turn}}},
+            {"contentBlockStop": {}},
+            {"messageStop": {"stopReason": "end_turn"}},
+        ]
+    else:
+        for i, call in enumerate(turn):
+            start = {"toolUse": {"toolUseId": f"call-{n}-{i}", "name": call["name"]}}
+            delta = {"toolUse": {"input": json.dumps(call["input"])}}
+            events += [
+                {"contentBlockStart": {"start": start}},
+                {"contentBlockDelta": {"delta": delta}},
+                {"contentBlockStop": {}},
+            ]
+        events.append({"messageStop": {"stopReason": "tool_use"}})
+    usage = {"inputTokens": 0, "outputTokens": 0, "totalTokens": 0}
+    events.append({"metadata": {"usage": usage, "metrics": {"latencyMs": 0}}})
+    return events
+
+
+def load_script(path: Path) -> list[Turn]:
+    script = json.loads(path.read_text())
+    if not isinstance(script, list) or not script:
+        raise ValueError(f"{path}: a script is a non-empty JSON list of turns")
+    return script
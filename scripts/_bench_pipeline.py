@@ -0,0 +1,319 @@
+"""Offline end-to-end benchmark of the tool pipeline, with no Bedrock.
+
+Each workload runs the real agent and tools against a scripted model
+(scripts/_bench_model.py), a local inbound directory, a local bare git
+remote and a stub SES, so all that's timed is our own code and git.
+Per-stage times come from the spans of each run:
+
+    digest   site digest for the first message
+    sync     sync_workspace (run 1 clones; later runs fetch)
+    parse    parse_inbound, less HEIC conversion
+    convert  convert_heic_to_jpg
+    edit     reading and writing site files (read/write/list, image_info,
+             add_gallery_items, changelog)
+    commit   publish_site_changes up to the push (prune, validate, commit)
+    push     the push itself
+    reply    send_reply (stubbed: MIME building only)
+    agent    everything else: Strands' event loop, hooks, tool dispatch
+
+Workloads:
+    small-edit   one text edit on a 12-page site
+    heic-photos  eight HEIC photos added to the gallery
+    large-site   a text edit on a site of 400 pages and 3000 images
+
+    python scripts/_bench_pipeline.py [--workload NAME ...] [--runs N]
+        [--heic-mp MP] [--script FILE] [--json OUT]
+
+Each workload runs in a fresh interpreter (the agent reads its paths
+from the environment at import) under a throwaway directory. Run 1 is
+the cold one; the table shows it and the median of the others.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+STAGES = ("digest", "sync", "parse", "convert", "edit", "commit", "push", "reply")
+WORKLOADS = ("small-edit", "heic-photos", "large-site")
+DEFAULT_RUNS = 3
+DEFAULT_HEIC_MP = 12.0
+HEIC_PHOTOS = 8
+
+_EDIT_TOOLS = {
+    "list_site_files",
+    "read_site_file",
+    "write_site_file",
+    "delete_site_file",
+    "image_info",
+    "add_gallery_items",
+    "append_changelog_entry",
+    "read_changelog",
+}
+
+
+def _call(name: str, **tool_input) -> list[dict]:
+    return [{"name": name, "input": tool_input}]
+
+
+def _text_edit_script(key: str, run: int) -> list:
+    index = (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n  <meta charset="utf-8">\n'
+        "  <title>Home</title>\n"
+        '  <link rel="stylesheet" href="css/style.css">\n</head>\n<body>\n'
+        '  <nav><a href="index.html">Home</a> <a href="gallery.html">Gallery</a>'
+        f"</nav>\n  <p class=\"welcome\">Welcome, visit number {run}!</p>\n"
+        "</body>\n</html>\n"
+    )
+    return [
+        _call("sync_workspace"),
+        _call("parse_inbound", key=key),
+        _call("read_site_file", path="index.html"),
+        _call("write_site_file", path="index.html", content=index),
+        _call(
+            "append_changelog_entry",
+            date="2026-03-02",
+            description=f"Updated the welcome text ({run}).",
+        ),
+        _call("publish_site_changes", message=f"Update welcome text ({run})"),
+        _call(
+            "send_reply",
+            to="cyndi@example.com",
+            subject="Re: Welcome text",
+            body_text="Done! The new welcome text is live.",
+        ),
+        "Updated the welcome text and replied.",
+    ]
+
+
+def _photos_script(key: str, run: int) -> list:
+    paths = [f"images/r{run}-photo-{n}.jpg" for n in range(HEIC_PHOTOS)]
+    return [
+        _call("sync_workspace"),
+        _call("parse_inbound", key=key),
+        _call("image_info", paths=paths),
+        _call(
+            "add_gallery_items",
+            items=[
+                {"path": path, "alt": f"New painting {n}"}
+                for n, path in enumerate(paths)
+            ],
+        ),
+        _call(
+            "append_changelog_entry",
+            date="2026-03-02",
+            description=f"Added {HEIC_PHOTOS} paintings to the gallery.",
+        ),
+        _call("publish_site_changes", message=f"Add {HEIC_PHOTOS} paintings"),
+        _call(
+            "send_reply",
+            to="cyndi@example.com",
+            subject="Re: New paintings",
+            body_text="They're in the gallery now.",
+        ),
+        "Added the photos and replied.",
+    ]
+
+
+def prepare(workload: str, root: Path, runs: int, heic_mp: float) -> None:
+    """Build the remote and the inbound emails for `workload` under root."""
+    from _bench_fixtures import attachment, email_bytes, photo, site_remote
+
+    inbound = root / "inbound"
+    inbound.mkdir()
+    if workload == "large-site":
+        site_remote(root, pages=400, images=3000)
+    else:
+        site_remote(root, pages=12, images=30)
+
+    if workload == "heic-photos":
+        photos = [photo("heic", heic_mp, seed=n) for n in range(HEIC_PHOTOS)]
+    for run in range(1, runs + 1):
+        if workload == "heic-photos":
+            files = [
+                attachment("heic", data, f"r{run}-photo-{n}")
+                for n, data in enumerate(photos)
+            ]
+            raw = email_bytes("New paintings", "Please add these!", files, seed=run)
+        else:
+            raw = email_bytes(
+                "Welcome text", "Please change the welcome text.", seed=run
+            )
+        (inbound / f"{workload}-{run}.eml").write_bytes(raw)
+
+
+def _stage_times(spans) -> dict[str, float]:
+    times = dict.fromkeys(STAGES, 0.0)
+    total = 0.0
+    tools = 0.0
+    for span in spans:
+        ms = (span.end_time - span.start_time) / 1e6
+        name = span.name
+        if name == "agent.invocation":
+            total = ms
+            times["digest"] += span.attributes.get("site_digest.build_ms", 0)
+        elif name == "convert_heic_to_jpg":
+            times["convert"] += ms
+            times["parse"] -= ms
+        elif name.startswith("execute_tool "):
+            tool = name.removeprefix("execute_tool ")
+            tools += ms
+            if tool == "sync_workspace":
+                times["sync"] += ms
+            elif tool == "parse_inbound":
+                times["parse"] += ms
+            elif tool in _EDIT_TOOLS:
+                times["edit"] += ms
+            elif tool == "publish_site_changes":
+                push = span.attributes.get("publish.push_ms", 0)
+                times["push"] += push
+                times["commit"] += ms - push
+            elif tool == "send_reply":
+                times["reply"] += ms
+    times["agent"] = total - tools - times["digest"]
+    times["total"] = total
+    return {stage: round(ms, 1) for stage, ms in times.items()}
+
+
+def run_workload(workload: str, runs: int, script_path: str | None) -> list[dict]:
+    """Run in the child interpreter, with the environment pointing at
+    the prepared directory."""
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    from _bench_model import ScriptedModel, load_script
+    from strands.handlers.callback_handler import null_callback_handler
+
+    from agent.cyndibot import apply_prompt_variant, build_agent, initial_message
+    from agent.tools import email_tools
+    from agent.tools.email_tools import inbound_features
+    from agent.tools.site_tools import WORKSPACE_DIR, using_workspace, workspace_lease
+
+    class StubSES:
+        def send_email(self, **kwargs):
+            return {"MessageId": "bench"}
+
+    email_tools.ses_client = StubSES
+
+    tracer = trace.get_tracer("bench")
+    results = []
+    for run in range(1, runs + 1):
+        key = f"{workload}-{run}.eml"
+        if script_path:
+            script = load_script(Path(script_path))
+        elif workload == "heic-photos":
+            script = _photos_script(key, run)
+        else:
+            script = _text_edit_script(key, run)
+        exporter.clear()
+        agent = build_agent(ScriptedModel(script))
+        agent.callback_handler = null_callback_handler
+        with (
+            tracer.start_as_current_span("agent.invocation"),
+            workspace_lease(WORKSPACE_DIR),
+            using_workspace(WORKSPACE_DIR),
+        ):
+            apply_prompt_variant(agent, inbound_features(key))
+            result = agent(initial_message(key))
+        failed = [
+            name for name, m in result.metrics.tool_metrics.items() if m.error_count
+        ]
+        if failed:
+            raise SystemExit(f"{workload} run {run}: tool errors in {failed}")
+        results.append(_stage_times(exporter.get_finished_spans()))
+    return results
+
+
+def child_env(root: Path) -> dict[str, str]:
+    """The environment for a benchmark child: every path the agent reads
+    at import points under root, and nothing leaks in from the shell."""
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if not k.startswith(("CYNDIBOT_", "GITHUB_TOKEN"))
+    }
+    env.update(
+        {
+            "CYNDIBOT_WORKSPACE": str(root / "ws"),
+            "CYNDIBOT_SITE_REPO": str(root / "remote.git"),
+            "CYNDIBOT_SNAPSHOT_PATH": str(root / "snapshot.bundle"),
+            "CYNDIBOT_INBOUND_SOURCE": str(root / "inbound"),
+            "OTEL_SERVICE_NAME": "bench",
+            "PYTHONPATH": os.pathsep.join(
+                [str(SCRIPTS_DIR.parent), str(SCRIPTS_DIR), env.get("PYTHONPATH", "")]
+            ),
+        }
+    )
+    return env
+
+
+def print_table(report: dict[str, list[dict]]) -> None:
+    columns = (*STAGES, "agent", "total")
+    print(f"{'workload':<12} {'run':<6}" + "".join(f"{c:>9}" for c in columns))
+    for workload, runs in report.items():
+        rows = [("cold", runs[0])]
+        if len(runs) > 1:
+            warm = {c: statistics.median(r[c] for r in runs[1:]) for c in columns}
+            rows.append(("warm", warm))
+        for label, row in rows:
+            print(
+                f"{workload:<12} {label:<6}"
+                + "".join(f"{row[c]:>9.0f}" for c in columns)
+            )
+    print("(ms; warm is the median of runs 2..N)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workload", action="append", choices=WORKLOADS)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--heic-mp", type=float, default=DEFAULT_HEIC_MP)
+    parser.add_argument("--script", help="JSON tool-call script to play instead")
+    parser.add_argument("--json", help="also write the per-run timings here")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_workload(args.child, args.runs, args.script)))
+        return
+
+    sys.path.insert(0, str(SCRIPTS_DIR.parent))
+    report = {}
+    for workload in args.workload or WORKLOADS:
+        with tempfile.TemporaryDirectory(prefix=f"bench-{workload}-") as tmp:
+            root = Path(tmp)
+            print(f"preparing {workload}...", file=sys.stderr)
+            prepare(workload, root, args.runs, args.heic_mp)
+            print(f"running {workload}...", file=sys.stderr)
+            command = [sys.executable, __file__, "--child", workload]
+            command += ["--runs", str(args.runs)]
+            if args.script:
+                command += ["--script", args.script]
+            child = subprocess.run(
+                command, env=child_env(root), capture_output=True, text=True
+            )
+            if child.returncode != 0:
+                raise SystemExit(f"{workload} failed:\n{child.stderr[-4000:]}")
+            report[workload] = json.loads(child.stdout.splitlines()[-1])
+
+    print_table(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
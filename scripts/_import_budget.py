@@ -0,0 +1,71 @@
+"""Import-time budget for the agent container's entry module.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter,
+prints the top-level imports by cumulative cost, and exits non-zero when
+the module's total import time is over budget.
+
+    python scripts/_import_budget.py [module] [--budget-ms N] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_MODULE = "agent.server"
+DEFAULT_BUDGET_MS = int(os.environ.get("CYNDIBOT_IMPORT_BUDGET_MS", "800"))
+DEFAULT_TOP = 15
+
+
+def importtime(module: str) -> list[tuple[int, int, str]]:
+    """(depth, cumulative_us, name) per line of -X importtime output."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        # Indentation of the name is the nesting depth; keep it.
+        name = name.rstrip()
+        stripped = name.lstrip(" ")
+        depth = (len(name) - len(stripped) - 1) // 2
+        rows.append((depth, int(cumulative_us), stripped))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("module", nargs="?", default=DEFAULT_MODULE)
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP)
+    args = parser.parse_args()
+
+    rows = importtime(args.module)
+    target = [r for r in rows if r[0] == 0 and r[2] == args.module]
+    if not target:
+        sys.exit(f"{args.module} not found in importtime output")
+    total_ms = target[-1][1] / 1000
+
+    # Direct children of the module are what its own import lines cost;
+    # one level deeper is where the heavy third-party packages show up.
+    shallow = [r for r in rows if r[0] in (1, 2)]
+    shallow.sort(key=lambda r: r[1], reverse=True)
+    print(f"{'cumulative ms':>14}  module")
+    for depth, cumulative_us, name in shallow[: args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}  {'  ' * (depth - 1)}{name}")
+    print()
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms} ms)")
+    if total_ms > args.budget_ms:
+        sys.exit(f"FAIL: over budget by {total_ms - args.budget_ms:.0f} ms")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,9 @@ Pushes HEAD to a throwaway branch on origin (NOT main), verifies the
 branch exists by asking git ls-remote, then deletes the branch. No
 live-site impact (GitHub Pages only watches main).
 
-Uses whatever git credentials the local environment already has (macOS
-keychain / gh credential helper). Prints enough detail to diagnose auth
+Auth is agent.github_token's: GITHUB_TOKEN / GITHUB_TOKEN_SECRET_ARN if
+set, otherwise whatever git credentials the environment already has
+(macOS keychain / gh credential helper). Prints enough detail to diagnose auth
 failures without blowing up the output on the happy path.
 """
 
@@ -14,9 +15,9 @@ import sys
 
 from agent.tools.site_tools import (
     WORKSPACE_DIR,
-    _run_git,
     commit_site_changes_impl,
     push_site_changes_impl,
+    run_git,
     sync_workspace_impl,
     write_site_file_impl,
 )
@@ -26,18 +27,13 @@ SMOKE_FILE = ".cyndibot-smoke"
 
 
 def remote_has_branch(branch: str) -> bool:
-    result = subprocess.run(
-        ["git", "ls-remote", "--heads", "origin", branch],
-        cwd=str(WORKSPACE_DIR),
-        capture_output=True,
-        text=True,
-        check=True,
+    return bool(
+        run_git("ls-remote", "--heads", "origin", branch, cwd=WORKSPACE_DIR).strip()
     )
-    return bool(result.stdout.strip())
 
 
 def delete_remote_branch(branch: str) -> None:
-    _run_git("push", "origin", "--delete", branch)
+    run_git("push", "origin", "--delete", branch)
 
 
 def main() -> None:
@@ -68,7 +64,7 @@ def main() -> None:
     print(f"   origin/{SMOKE_BRANCH} deleted ✓")
 
     print()
-    print("push auth works. The main-branch push_site_changes tool is safe to call.")
+    print("push auth works. publish_site_changes is safe to call.")
 
 
 if __name__ == "__main__":